@@ -0,0 +1,98 @@
+"""
+Benchmark of the crawler HTML link extractors on large pages.
+
+    python benchmarks/link_extractors.py [--links 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+
+settings.configure(DEFAULT_CHARSET="utf-8")
+
+from django.http import HttpResponse
+
+from germanium.crawler import HTMLLinkExtractor, LxmlHTMLLinkExtractor, etree
+
+
+class LegacyHTMLLinkExtractor:
+    """
+    The original extractor (one HTMLParser subclass per call, the whole page decoded at once).
+    """
+
+    link_attr_names = ("href", "src")
+
+    def extract(self, content):
+        link_attr_names = self.link_attr_names
+
+        class SaxLinkExtractor(HTMLParser):
+            links = set()
+
+            def handle_starttag(self, tag, attrs):
+                self.links.update(v for k, v in attrs if k in link_attr_names)
+
+        parser = SaxLinkExtractor()
+        parser.feed(content)
+        parser.close()
+
+        return parser.links
+
+    def extract_from_response(self, response):
+        return self.extract(response.content.decode("utf-8"))
+
+
+def generate_page(links):
+    rows = "".join(
+        (
+            '<tr class="row"><td><a href="/items/{0}/?page={0}&amp;order=name">Item {0}</a></td>'
+            '<td><img src="/media/items/{0}.png" alt="item"></td>'
+            '<td><span class="price" data-value="{0}">{0} Kč</span></td></tr>'
+        ).format(i)
+        for i in range(links)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><link rel="stylesheet" href="/static/main.css">'
+        '<script src="/static/main.js"></script></head><body><table>{}</table></body></html>'
+    ).format(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--links", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    response = HttpResponse(generate_page(args.links))
+    extractors = [
+        ("legacy", LegacyHTMLLinkExtractor()),
+        ("html.parser", HTMLLinkExtractor()),
+    ]
+    if etree is not None:
+        extractors.append(("lxml", LxmlHTMLLinkExtractor()))
+
+    print(
+        "Page size {:.1f} MB, {} links".format(
+            len(response.content) / 2**20, args.links
+        )
+    )
+    for name, extractor in extractors:
+        links = extractor.extract_from_response(response)
+        duration = min(
+            timeit.repeat(
+                lambda: extractor.extract_from_response(response),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print("{:<12} {:8.3f}s {:8d} links".format(name, duration, len(links)))
+
+
+if __name__ == "__main__":
+    main()
@@ -42,3 +42,18 @@ WINDOW_SIZE = (1124, 850)
 TURN_OFF_MAX_DIFF = getattr(settings, "TURN_OFF_MAX_DIFF", True)
 
 TEST_ALL_DATABASES = getattr(settings, "GERMANIUM_TEST_ALL_DATABASES", False)
+
+PARALLEL_DB_CLONING = getattr(settings, "GERMANIUM_PARALLEL_DB_CLONING", False)
+CHECK_TEST_DB_HASH = getattr(settings, "GERMANIUM_CHECK_TEST_DB_HASH", False)
+
+BULK_GLOBAL_FIXTURES = getattr(settings, "GERMANIUM_BULK_GLOBAL_FIXTURES", False)
+FIXTURES_BATCH_SIZE = getattr(settings, "GERMANIUM_FIXTURES_BATCH_SIZE", 1000)
+SNAPSHOT_FIXTURES = getattr(settings, "GERMANIUM_SNAPSHOT_FIXTURES", False)
+
+DATA_CONSUMER_LAZY_ROLLBACK = getattr(
+    settings, "GERMANIUM_DATA_CONSUMER_LAZY_ROLLBACK", False
+)
+
+N_PLUS_ONE_THRESHOLD = getattr(settings, "GERMANIUM_N_PLUS_ONE_THRESHOLD", 5)
+
+TEST_DURATIONS_FILE = getattr(settings, "GERMANIUM_TEST_DURATIONS_FILE", None)
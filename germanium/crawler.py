@@ -1,20 +1,101 @@
+import codecs
+import copy
+import csv
+import heapq
+import itertools
+import json
+import math
+import multiprocessing
+import pickle
+import queue
 import re
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import zlib
 
 import logging
 
-from urllib.parse import urlparse, urljoin
+from contextlib import ExitStack
+from functools import lru_cache
+from urllib.parse import (
+    parse_qsl,
+    urlencode,
+    urljoin,
+    urlparse,
+    urlsplit,
+    urlunsplit,
+)
 from html.parser import HTMLParser
+from multiprocessing.pool import RemoteTraceback
+from xml.etree.ElementTree import XMLPullParser
 
 from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from germanium.django.utils import clone_test_db, setup_worker_connection
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 LOG = logging.getLogger("tests")
 
+# Database connections inherited by the forked crawler process
+_inherited_connections = []
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_response_chunks(response, chunk_size=CHUNK_SIZE):
+    if response.streaming:
+        yield from response.streaming_content
+    else:
+        content = memoryview(response.content)
+        for i in range(0, len(content), chunk_size):
+            yield content[i : i + chunk_size]
+
+
+def iter_response_text(response, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally decode the response content with the response charset.
+    """
+    decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(
+        errors="replace"
+    )
+    for chunk in iter_response_chunks(response, chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
 
 class LinkExtractor:
 
     def extract(self, content):
         raise NotImplementedError
 
+    def extract_from_response(self, response):
+        content = response.content
+        if "utf-8" in response["Content-Type"]:
+            content = content.decode("utf-8")
+        return self.extract(content)
+
+    def _is_extract_overridden(self, extractor_class):
+        # Subclasses of the streaming extractors which override extract must get the whole content
+        return type(self).extract is not extractor_class.extract
+
 
 class DummyLinkExtractor(LinkExtractor):
 
@@ -22,31 +103,250 @@ class DummyLinkExtractor(LinkExtractor):
         return []
 
 
+class LinkHTMLParser(HTMLParser):
+    """
+    HTML parser which collects links only from the tags that can contain a link.
+    """
+
+    def __init__(self, link_tags, link_attr_names):
+        super().__init__()
+        self.link_tags = link_tags
+        self.link_attr_names = link_attr_names
+        self.links = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.link_tags:
+            link_attr_names = self.link_attr_names
+            self.links.update(
+                value for name, value in attrs if value and name in link_attr_names
+            )
+
+    def pop_links(self):
+        links, self.links = self.links, set()
+        self.reset()
+        return links
+
+
 class HTMLLinkExtractor(LinkExtractor):
+    """
+    Streaming HTML link extractor. Response is decoded and parsed in chunks, one parser is reused in every thread.
+    """
 
-    link_attr_names = ("href", "src")
+    link_tags = frozenset(("a", "link", "script", "img", "form", "iframe"))
+    link_attr_names = frozenset(("href", "src", "action"))
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _get_parser(self):
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = LinkHTMLParser(
+                self.link_tags, self.link_attr_names
+            )
+        return parser
+
+    def _extract_from_chunks(self, chunks):
+        parser = self._get_parser()
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+            parser.close()
+        finally:
+            links = parser.pop_links()
+        return links
 
     def extract(self, content):
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        return self._extract_from_chunks(
+            content[i : i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)
+        )
+
+    def extract_from_response(self, response):
+        if self._is_extract_overridden(HTMLLinkExtractor):
+            return super().extract_from_response(response)
+        return self._extract_from_chunks(iter_response_text(response))
+
+
+class LxmlHTMLLinkExtractor(HTMLLinkExtractor):
+    """
+    Streaming HTML link extractor which uses the lxml pull parser, the lxml library must be installed.
+    """
+
+    def _get_parser(self, encoding=None):
+        return etree.HTMLPullParser(
+            events=("start",), tag=self.link_tags, encoding=encoding
+        )
+
+    def _extract_from_chunks(self, chunks, encoding=None):
+        parser = self._get_parser(encoding)
+        links = set()
+        for chunk in chunks:
+            parser.feed(chunk)
+            links.update(self._read_links(parser))
+        parser.close()
+        links.update(self._read_links(parser))
+        return links
+
+    def _read_links(self, parser):
         link_attr_names = self.link_attr_names
+        for _, element in parser.read_events():
+            for name, value in element.items():
+                if value and name in link_attr_names:
+                    yield value
+
+    def extract_from_response(self, response):
+        if self._is_extract_overridden(HTMLLinkExtractor):
+            return LinkExtractor.extract_from_response(self, response)
+        # lxml decodes the content itself
+        return self._extract_from_chunks(
+            (bytes(chunk) for chunk in iter_response_chunks(response)),
+            response.charset,
+        )
+
+
+def get_html_link_extractor():
+    """
+    Return the fastest available HTML link extractor.
+    """
+    return LxmlHTMLLinkExtractor() if etree is not None else HTMLLinkExtractor()
+
+
+class JSONLinkExtractor(LinkExtractor):
+    """
+    Extracts string values of the link keys (for example {"url": "/api/users/1"} or HAL
+    {"_links": {"next": {"href": "/api/users?page=2"}}}) and string values directly under the relation keys of
+    the link containers (for example JSON:API {"links": {"self": "/api/users/1"}}). Other attributes of the link
+    objects (title, type, name) are not links. If the ijson library is installed, the response is parsed
+    incrementally, otherwise it is loaded at once.
+    """
+
+    link_keys = frozenset(("url", "href", "next", "previous"))
+    link_container_keys = frozenset(("_links", "links"))
+
+    def _is_link_path(self, path):
+        keys = [key for key in path if key is not None]
+        return bool(keys) and (
+            keys[-1] in self.link_keys
+            or (
+                len(path) > 1
+                and path[-1] is not None
+                and path[-2] in self.link_container_keys
+            )
+        )
+
+    def _iter_strings(self, value, path=()):
+        if isinstance(value, str):
+            yield path, value
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                yield from self._iter_strings(item, path + (key,))
+        elif isinstance(value, list):
+            for item in value:
+                yield from self._iter_strings(item, path + (None,))
+
+    def _iter_events_strings(self, events):
+        for prefix, event, value in events:
+            if event == "string":
+                yield tuple(
+                    None if key == "item" else key for key in prefix.split(".")
+                ), value
+
+    def _iter_response_strings(self, response):
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events)
+        for chunk in iter_response_chunks(response):
+            parser.send(bytes(chunk))
+            yield from self._iter_events_strings(events)
+            del events[:]
+        parser.close()
+        yield from self._iter_events_strings(events)
+
+    def extract(self, content):
+        return {
+            value
+            for path, value in self._iter_strings(json.loads(content))
+            if self._is_link_path(path)
+        }
+
+    def extract_from_response(self, response):
+        if self._is_extract_overridden(JSONLinkExtractor):
+            return super().extract_from_response(response)
+        if ijson is None:
+            return self.extract(response.content)
+        return {
+            value
+            for path, value in self._iter_response_strings(response)
+            if self._is_link_path(path)
+        }
+
+
+class SitemapLinkExtractor(LinkExtractor):
+    """
+    Extracts URLs from the loc elements of the XML sitemap or sitemap index. XML is parsed incrementally and parsed
+    elements are cleared. Absolute URLs are converted to the relative ones, because sitemap URLs contain the site
+    domain.
+    """
 
-        class SaxLinkExtractor(HTMLParser):
-            links = set()
+    def __init__(self, relative_urls=True):
+        self.relative_urls = relative_urls
 
-            def handle_starttag(self, tag, attrs):
-                self.links.update(v for k, v in attrs if k in link_attr_names)
+    def _get_link(self, url):
+        if self.relative_urls:
+            parsed_url = urlsplit(url)
+            return urlunsplit(("", "", parsed_url.path, parsed_url.query, ""))
+        return url
 
-        parser = SaxLinkExtractor()
-        parser.feed(content)
+    def _iter_links(self, parser):
+        for _, element in parser.read_events():
+            if element.tag == "loc" or element.tag.endswith("}loc"):
+                if element.text and element.text.strip():
+                    yield self._get_link(element.text.strip())
+            elif len(element):
+                element.clear()
+
+    def _extract_from_chunks(self, chunks):
+        parser = XMLPullParser(events=("end",))
+        links = set()
+        for chunk in chunks:
+            parser.feed(chunk)
+            links.update(self._iter_links(parser))
         parser.close()
+        links.update(self._iter_links(parser))
+        return links
+
+    def extract(self, content):
+        return self._extract_from_chunks((content,))
 
-        return parser.links
+    def extract_from_response(self, response):
+        if self._is_extract_overridden(SitemapLinkExtractor):
+            return super().extract_from_response(response)
+        return self._extract_from_chunks(
+            bytes(chunk) for chunk in iter_response_chunks(response)
+        )
+
+
+def canonicalize_url(url):
+    """
+    Return URL which is used to find duplicate URLs. Fragment, order of query parameters, trailing slash and
+    the test server host are ignored.
+    """
+    parsed_url = urlsplit(url)
+    scheme, netloc = parsed_url.scheme.lower(), parsed_url.netloc.lower()
+    if netloc.startswith("testserver"):
+        scheme, netloc = "", ""
+    path = parsed_url.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parsed_url.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
 
 
 class URLWithReferer:
 
-    def __init__(self, url, referer=None):
+    def __init__(self, url, referer=None, depth=0):
         self.url = url
         self.referer = referer
+        self.depth = depth
 
     def __eq__(self, other):
         if isinstance(other, URLWithReferer):
@@ -68,6 +368,388 @@ class URLWithReferer:
         return self.url
 
 
+class CrawlFrontier:
+    """
+    Queue of URLs which will be crawled. URLs are deduplicated by the canonical URL (every URL is accepted only
+    once, even after it was popped) and they are popped by the depth or by the priority function (lower value first).
+    Frontier can limit depth of the URLs, number of popped URLs (max_pages) and number of URLs matching a pattern
+    (pattern_limits is a dictionary pattern -> number of URLs). URLs added after max_pages was reached are kept
+    (they are stored in the checkpoint and crawled after resume), but they are never popped.
+    """
+
+    def __init__(
+        self, max_depth=None, max_pages=None, pattern_limits=None, priority=None
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.pattern_limits = [
+            (re.compile(pattern), limit)
+            for pattern, limit in (pattern_limits or {}).items()
+        ]
+        self.pattern_counts = [0] * len(self.pattern_limits)
+        self.priority = priority or (lambda url_with_referer: url_with_referer.depth)
+        self.seen_urls = set()
+        self.new_seen_urls = None
+        self.popped_count = 0
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        if self.max_pages is not None:
+            return min(len(self._heap), max(self.max_pages - self.popped_count, 0))
+        return len(self._heap)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    @property
+    def is_exhausted(self):
+        return self.max_pages is not None and self.popped_count >= self.max_pages
+
+    def clear(self):
+        """
+        Remove all waiting URLs, returns number of removed URLs.
+        """
+        count, self._heap = len(self._heap), []
+        return count
+
+    def __iter__(self):
+        return (url_with_referer for _, _, url_with_referer in sorted(self._heap))
+
+    def __contains__(self, url):
+        return canonicalize_url(str(url)) in self.seen_urls
+
+    def _add_seen_url(self, canonical_url):
+        if self.new_seen_urls is not None:
+            self.new_seen_urls.append(canonical_url)
+        self.seen_urls.add(canonical_url)
+
+    def mark_seen(self, url):
+        canonical_url = canonicalize_url(url)
+        if canonical_url not in self.seen_urls:
+            self._add_seen_url(canonical_url)
+
+    def track_new_seen_urls(self):
+        """
+        Remember seen URLs which were not returned with pop_new_seen_urls yet (used for checkpoints).
+        """
+        if self.new_seen_urls is None:
+            self.new_seen_urls = list(self.seen_urls)
+
+    def pop_new_seen_urls(self):
+        new_seen_urls, self.new_seen_urls = self.new_seen_urls, []
+        return new_seen_urls
+
+    def get_pattern_counts(self):
+        return {
+            pattern.pattern: count
+            for (pattern, _), count in zip(self.pattern_limits, self.pattern_counts)
+        }
+
+    def restore(self, url_with_referers, seen_urls, pattern_counts):
+        """
+        Restore state of the frontier stored in the checkpoint. Limit max_pages is not restored, it limits
+        the number of URLs crawled in one run.
+        """
+        self.seen_urls.update(seen_urls)
+        self.pattern_counts = [
+            pattern_counts.get(pattern.pattern, 0) for pattern, _ in self.pattern_limits
+        ]
+        for url_with_referer in url_with_referers:
+            self.seen_urls.add(canonicalize_url(url_with_referer.url))
+            heapq.heappush(
+                self._heap,
+                (
+                    self.priority(url_with_referer),
+                    next(self._counter),
+                    url_with_referer,
+                ),
+            )
+
+    def _check_pattern_limits(self, url):
+        matched_indexes = [
+            i
+            for i, (pattern, limit) in enumerate(self.pattern_limits)
+            if pattern.search(url)
+        ]
+        if any(
+            self.pattern_counts[i] >= self.pattern_limits[i][1] for i in matched_indexes
+        ):
+            return False
+        for i in matched_indexes:
+            self.pattern_counts[i] += 1
+        return True
+
+    def add(self, url_with_referer):
+        """
+        Add URL to the frontier, returns False if URL was already seen or it exceeds the limits.
+        """
+        canonical_url = canonicalize_url(url_with_referer.url)
+        if canonical_url in self.seen_urls:
+            return False
+        if self.max_depth is not None and url_with_referer.depth > self.max_depth:
+            return False
+        if not self._check_pattern_limits(url_with_referer.url):
+            LOG.debug("Skipping URL %s over the pattern limit", url_with_referer.url)
+            return False
+        self._add_seen_url(canonical_url)
+        heapq.heappush(
+            self._heap,
+            (self.priority(url_with_referer), next(self._counter), url_with_referer),
+        )
+        return True
+
+    def pop(self):
+        if not self:
+            raise KeyError("pop from an empty frontier")
+        self.popped_count += 1
+        return heapq.heappop(self._heap)[2]
+
+
+class ExcludeMatcher:
+    """
+    Matches URLs (the whole URL) with the exclude patterns or the literal prefixes. Patterns with a literal prefix
+    followed by ".*" are checked as prefixes with one str.startswith call, other simple patterns are compiled into
+    one alternation regex. Patterns with groups (group names must be unique in one regex and backreferences
+    use group numbers) or an alternation are compiled separately. Results are cached for the repeated URLs.
+    """
+
+    literal_prefix_pattern = re.compile(r"^([^.^$*+?{}\[\]\\|()]*)\.\*$")
+
+    def __init__(self, patterns=None, prefixes=None, cache_size=100000):
+        prefixes = list(prefixes or ())
+        regex_patterns = []
+        self.regexes = []
+        for pattern in patterns or ():
+            literal_prefix_match = self.literal_prefix_pattern.match(pattern)
+            if literal_prefix_match:
+                prefixes.append(literal_prefix_match.group(1))
+            elif self._is_simple_pattern(pattern):
+                regex_patterns.append(pattern)
+            else:
+                self.regexes.append(re.compile(r"^{}$".format(pattern)))
+        self.prefixes = tuple(prefixes)
+        if regex_patterns:
+            self.regexes.insert(
+                0,
+                re.compile(
+                    r"^(?:{})$".format(
+                        "|".join("(?:{})".format(pattern) for pattern in regex_patterns)
+                    )
+                ),
+            )
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _is_simple_pattern(self, pattern):
+        regex = re.compile(pattern)
+        return not regex.groups and "|" not in pattern
+
+    def _match(self, url):
+        return url.startswith(self.prefixes) or any(
+            regex.match(url) is not None for regex in self.regexes
+        )
+
+
+class CrawlCheckpoint:
+    """
+    Stores state of the crawler (frontier, seen and crawled URLs and result of every crawled URL) to the SQLite
+    database. Seen and crawled URLs and results are only appended, frontier is replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS frontier (url TEXT, referer TEXT, depth INTEGER);
+                CREATE TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS crawled_urls (url TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS results (
+                    url TEXT PRIMARY KEY, referer TEXT, status_code INTEGER, exception TEXT
+                );
+                CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+                """)
+
+    def save(self, url_with_referers, seen_urls, crawled_urls, results, state):
+        with self.connection:
+            self.connection.execute("DELETE FROM frontier")
+            self.connection.executemany(
+                "INSERT INTO frontier VALUES (?, ?, ?)",
+                (
+                    (
+                        url_with_referer.url,
+                        url_with_referer.referer,
+                        url_with_referer.depth,
+                    )
+                    for url_with_referer in url_with_referers
+                ),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO seen_urls VALUES (?)",
+                ((url,) for url in seen_urls),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO crawled_urls VALUES (?)",
+                ((url,) for url in crawled_urls),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", results
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO state VALUES (?, ?)",
+                ((key, json.dumps(value)) for key, value in state.items()),
+            )
+
+    def load_frontier(self):
+        return [
+            URLWithReferer(url, referer, depth)
+            for url, referer, depth in self.connection.execute(
+                "SELECT url, referer, depth FROM frontier ORDER BY rowid"
+            )
+        ]
+
+    def load_seen_urls(self):
+        return {url for (url,) in self.connection.execute("SELECT url FROM seen_urls")}
+
+    def load_crawled_urls(self):
+        return {
+            url for (url,) in self.connection.execute("SELECT url FROM crawled_urls")
+        }
+
+    def load_state(self):
+        return {
+            key: json.loads(value)
+            for key, value in self.connection.execute("SELECT key, value FROM state")
+        }
+
+    def iter_results(self):
+        """
+        Yields tuples (url, referer, status code, exception) of all crawled URLs.
+        """
+        return self.connection.execute(
+            "SELECT url, referer, status_code, exception FROM results ORDER BY rowid"
+        )
+
+    def close(self):
+        self.connection.close()
+
+
+class CrawlReport:
+    """
+    Records status, number of redirects, response size, render time and number and time of database queries of
+    every crawled URL. Queries are captured in all databases (or only in the databases from the argument).
+    """
+
+    fields = (
+        "url",
+        "referer",
+        "status_code",
+        "redirects",
+        "size",
+        "duration",
+        "queries",
+        "query_time",
+    )
+
+    def __init__(self, databases=None):
+        self.databases = databases
+        self.records = []
+        self._lock = threading.Lock()
+
+    def request(self, url, referer, send_request):
+        """
+        Call send_request and record the metrics of the returned response (status code and size are None if
+        send_request raised an exception).
+        """
+        response = exception = None
+        with ExitStack() as stack:
+            captured_queries_contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in (self.databases or connections)
+            ]
+            start = time.perf_counter()
+            try:
+                response = send_request()
+            except Exception as e:
+                # Failed request is recorded too, the exception is re-raised after
+                exception = e
+            duration = time.perf_counter() - start
+        captured_queries = [
+            query
+            for captured_queries_context in captured_queries_contexts
+            for query in captured_queries_context.captured_queries
+        ]
+        self.add_record(
+            {
+                "url": url,
+                "referer": referer,
+                "status_code": response.status_code if response is not None else None,
+                "redirects": len(getattr(response, "redirect_chain", ())),
+                "size": (
+                    len(response.content)
+                    if response is not None and not response.streaming
+                    else None
+                ),
+                "duration": duration,
+                "queries": len(captured_queries),
+                "query_time": sum(float(query["time"]) for query in captured_queries),
+            }
+        )
+        if exception is not None:
+            raise exception
+        return response
+
+    def add_record(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def write(self, path):
+        """
+        Write records to the CSV file (path with .csv extension) or JSON file.
+        """
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=self.fields)
+                writer.writeheader()
+                writer.writerows(self.records)
+            else:
+                json.dump(self.records, f, indent=2)
+
+    def get_top(self, key, count):
+        return sorted(
+            (record for record in self.records if record[key] is not None),
+            key=lambda record: record[key],
+            reverse=True,
+        )[:count]
+
+    def print_summary(self, count=10, stream=None):
+        """
+        Print the slowest pages and the heaviest pages by response size and by number of queries.
+        """
+        stream = stream or sys.stderr
+        for key, title in (
+            ("duration", "slowest pages"),
+            ("size", "largest pages"),
+            ("queries", "pages with the most queries"),
+        ):
+            top_records = self.get_top(key, count)
+            if not top_records:
+                continue
+            stream.write("\n{} {}:\n".format(len(top_records), title))
+            for record in top_records:
+                stream.write(
+                    "{:.3f}s {} ({} B, {} queries {:.3f}s, status {}, referer {})\n".format(
+                        record["duration"],
+                        record["url"],
+                        record["size"],
+                        record["queries"],
+                        record["query_time"],
+                        record["status_code"],
+                        record["referer"],
+                    )
+                )
+
+
 class Crawler:
 
     def __init__(
@@ -78,9 +760,28 @@ class Crawler:
         pre_request=None,
         post_response=None,
         extra_link_extractors=None,
+        workers=1,
+        client_factory=None,
+        processes=1,
+        max_depth=None,
+        max_pages=None,
+        pattern_limits=None,
+        priority=None,
+        checkpoint_path=None,
+        checkpoint_interval=100,
+        report=None,
     ):
         self.client = client
-        self.urls = set()
+        self.workers = workers
+        self.client_factory = client_factory
+        self.processes = processes
+        self.frontier_options = {
+            "max_depth": max_depth,
+            "max_pages": max_pages,
+            "pattern_limits": pattern_limits,
+            "priority": priority,
+        }
+        self.urls = self.create_frontier()
         if base_urls:
             for url in base_urls:
                 self.urls.add(URLWithReferer(url))
@@ -90,51 +791,446 @@ class Crawler:
         self.pre_request = pre_request
         self.post_response = post_response
         self.link_extractors = {
-            "text/html": HTMLLinkExtractor(),
+            "text/html": get_html_link_extractor(),
+            "application/json": JSONLinkExtractor(),
+            "application/hal+json": JSONLinkExtractor(),
+            "application/vnd.api+json": JSONLinkExtractor(),
+            "application/xml": SitemapLinkExtractor(),
+            "text/xml": SitemapLinkExtractor(),
             "default": DummyLinkExtractor(),
         }
         if extra_link_extractors:
             self.link_extractors.update(extra_link_extractors)
-        self.excluded_urls_regexs = [
-            re.compile(r"^{}$".format(url)) for url in self.exclude_urls
-        ]
+        self.exclude_matcher = ExcludeMatcher(self.exclude_urls)
+        self.skipped_path_prefixes = self._get_skipped_path_prefixes()
+        self._get_link_type = lru_cache(maxsize=100000)(self._get_link_type)
+        self._frontier_condition = threading.Condition()
+        self._hooks_lock = threading.RLock()
+        self._pending_requests = 0
+        self._running_urls = set()
+        self._worker_exceptions = []
+        self._shard = None
+        self._finished_requests = 0
+        self.report = report
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint = None
+        if checkpoint_path:
+            self._init_checkpoint(checkpoint_path)
+
+    def _init_checkpoint(self, path):
+        self.checkpoint = CrawlCheckpoint(path)
+        self.urls.track_new_seen_urls()
+        self._new_crawled_urls = list(self.crawled_urls)
+        self._new_results = {}
+
+    def create_frontier(self, shards=1):
+        """
+        Create the frontier, limits of the shard frontier are divided by the number of shards.
+        """
+        max_pages = self.frontier_options["max_pages"]
+        pattern_limits = self.frontier_options["pattern_limits"] or {}
+        return CrawlFrontier(
+            max_depth=self.frontier_options["max_depth"],
+            max_pages=(
+                math.ceil(max_pages / shards) if max_pages is not None else None
+            ),
+            pattern_limits={
+                pattern: math.ceil(limit / shards)
+                for pattern, limit in pattern_limits.items()
+            },
+            priority=self.frontier_options["priority"],
+        )
 
     def run(self):
-        while self.urls:
-            self._call_request(self.urls.pop())
+        self._worker_exceptions = []
+        if self.processes > 1:
+            self._run_sharded()
+        elif self.workers > 1:
+            self._run_concurrently()
+        else:
+            url_with_referer = self._pop_url()
+            while url_with_referer is not None:
+                self._process_url(url_with_referer, self.client)
+                url_with_referer = self._pop_url()
+        if self.checkpoint:
+            self.save_checkpoint()
 
-    def _parse_urls(self, url, resp):
-        returned_urls = []
-        content_type = resp["Content-Type"].split(";")[0]
-        if content_type in self.link_extractors:
-            content = resp.content
-            if "utf-8" in resp["Content-Type"]:
-                content = content.decode("utf-8")
+    def resume(self, path=None):
+        """
+        Restore state of the crawler from the checkpoint file and continue crawling. Base URLs which were already
+        seen are not crawled again.
+        """
+        if path and (not self.checkpoint or self.checkpoint.path != path):
+            self._init_checkpoint(path)
+        if not self.checkpoint:
+            raise ValueError("Checkpoint path must be set")
 
-            for link in self.link_extractors.get(
-                content_type, self.link_extractors["default"]
-            ).extract(content):
-                parsed_href = urlparse(link)
+        state = self.checkpoint.load_state()
+        with self._frontier_condition:
+            base_urls = list(self.urls)
+            self.urls = self.create_frontier()
+            self.urls.restore(
+                self.checkpoint.load_frontier(),
+                self.checkpoint.load_seen_urls(),
+                state.get("pattern_counts", {}),
+            )
+            self.urls.track_new_seen_urls()
+            for url_with_referer in base_urls:
+                self.urls.add(url_with_referer)
+            self.crawled_urls.update(self.checkpoint.load_crawled_urls())
+        self.run()
+
+    def save_checkpoint(self):
+        with self._frontier_condition:
+            # Running requests are stored in the frontier, they are requested again after resume
+            self.checkpoint.save(
+                itertools.chain(self._running_urls, self.urls),
+                self.urls.pop_new_seen_urls(),
+                self._new_crawled_urls,
+                self._new_results.values(),
+                {"pattern_counts": self.urls.get_pattern_counts()},
+            )
+            self._new_crawled_urls = []
+            self._new_results = {}
+
+    def create_worker_client(self):
+        """
+        Return the test client for the worker thread. The client is a copy of the crawler client with its own
+        cookies (the session of the logged user is shared) if client_factory is not set.
+        """
+        if self.client_factory:
+            return self.client_factory()
+        client = copy.copy(self.client)
+        client.cookies = copy.deepcopy(self.client.cookies)
+        return client
+
+    def _run_concurrently(self):
+        """
+        Crawl URLs in the worker threads. The first exception raised in a worker stops the other workers and it is
+        re-raised from the run method.
+        """
+        threads = [
+            threading.Thread(
+                target=self._run_worker,
+                args=(self.create_worker_client(),),
+                name="germanium-crawler-{}".format(i),
+            )
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._worker_exceptions:
+            raise self._worker_exceptions[0]
+
+    def _get_shard_index(self, url):
+        return zlib.crc32(canonicalize_url(url).encode("utf-8")) % self.processes
+
+    def _get_database_aliases(self):
+        return [
+            alias
+            for alias in connections
+            if not connections[alias].settings_dict.get("TEST", {}).get("MIRROR")
+        ]
+
+    def _run_sharded(self):
+        """
+        Shard URLs by the hash of the canonical URL across forked processes. Every process uses its own clone of
+        the test databases, links of the other shards are sent to their process through the queue. Shared counter
+        contains number of URLs which are queued or crawled in all processes, crawling ends when it drops to zero.
+        """
+        if self.checkpoint:
+            raise ValueError("Checkpoints are not supported with processes")
+
+        aliases = self._get_database_aliases()
+        for alias in aliases:
+            if connections[alias].in_atomic_block:
+                raise RuntimeError(
+                    "Crawler with processes cannot be run inside a transaction, data must be committed to be "
+                    "cloned (use TransactionTestCase instead of TestCase)"
+                )
+        for alias in aliases:
+            clone_test_db(connections[alias], self.processes, verbosity=0)
+
+        context = multiprocessing.get_context("fork")
+        inboxes = [context.Queue() for _ in range(self.processes)]
+        results_queue = context.Queue()
+        pending_urls = context.Value("i", 0)
+        while self.urls:
+            url_with_referer = self.urls.pop()
+            pending_urls.value += 1
+            inboxes[self._get_shard_index(url_with_referer.url)].put(
+                (url_with_referer.url, url_with_referer.referer, url_with_referer.depth)
+            )
 
-                if not parsed_href.path:
+        processes = [
+            context.Process(
+                target=self._run_shard,
+                args=(index, aliases, inboxes, results_queue, pending_urls),
+                name="germanium-crawler-{}".format(index + 1),
+            )
+            for index in range(self.processes)
+        ]
+        for process in processes:
+            process.start()
+        results = []
+        try:
+            while len(results) < len(processes):
+                try:
+                    result = results_queue.get(timeout=1)
+                except queue.Empty:
+                    if any(process.exitcode for process in processes):
+                        # Process was killed without sending the result
+                        break
                     continue
+                results.append(result)
+                if result["error"] is not None:
+                    # Other processes would wait for URLs of the failed process forever
+                    break
+        finally:
+            for process in processes:
+                if process.is_alive() and len(results) < len(processes):
+                    process.terminate()
+                process.join()
+            for alias in aliases:
+                # Clones are destroyed with the copy of the connection, destroy_test_db closes the connection
+                clone_connection = connections[alias].copy()
+                for index in range(self.processes):
+                    clone_connection.creation.destroy_test_db(
+                        verbosity=0, suffix=str(index + 1)
+                    )
+                clone_connection.close()
+
+        for result in results:
+            if result["error"] is not None:
+                self._raise_shard_error(*result["error"])
+        for process in processes:
+            if process.exitcode:
+                raise RuntimeError(
+                    "Crawler process {} failed with exit code {}".format(
+                        process.name, process.exitcode
+                    )
+                )
+        for result in results:
+            self.crawled_urls.update(result["crawled_urls"])
+            if self.report is not None:
+                self.report.records.extend(result["report_records"])
+
+    def _get_shard_error(self, exception):
+        """
+        Return the pickled exception (None if it cannot be pickled) and the formatted traceback of the exception
+        raised in the crawler process.
+        """
+        try:
+            pickled_exception = pickle.dumps(exception)
+        except Exception:
+            pickled_exception = None
+        return pickled_exception, traceback.format_exc()
 
-                if parsed_href.scheme and not parsed_href.netloc.startswith(
-                    "testserver"
+    def _raise_shard_error(self, pickled_exception, formatted_traceback):
+        """
+        Re-raise the exception of the crawler process, its traceback is attached as the cause.
+        """
+        exception = None
+        if pickled_exception is not None:
+            try:
+                exception = pickle.loads(pickled_exception)
+            except Exception:
+                pass
+        if exception is None:
+            exception = RuntimeError("Crawler process failed")
+        raise exception from RemoteTraceback(formatted_traceback)
+
+    def _update_pending_urls(self, count):
+        pending_urls = self._shard[2]
+        with pending_urls.get_lock():
+            pending_urls.value += count
+            return pending_urls.value
+
+    def _receive_urls(self, block):
+        index, inboxes, _ = self._shard
+        try:
+            url, referer, depth = (
+                inboxes[index].get(timeout=0.1)
+                if block
+                else inboxes[index].get_nowait()
+            )
+            while True:
+                # URLs over the max_pages limit are never crawled in the shard
+                if self.urls.is_exhausted or not self.urls.add(
+                    URLWithReferer(url, referer, depth)
                 ):
-                    LOG.debug("Skipping external link: %s", link)
-                    continue
+                    self._update_pending_urls(-1)
+                url, referer, depth = inboxes[index].get_nowait()
+        except queue.Empty:
+            pass
+
+    def _run_shard(self, index, aliases, inboxes, results_queue, pending_urls):
+        for alias in aliases:
+            connection = connections[alias]
+            if not getattr(connection, "is_in_memory_db", lambda: False)():
+                # The connection inherited from the main process must not be closed, it would close the session of
+                # the main process too. The object is kept to not be closed by the garbage collector.
+                _inherited_connections.append(connection.connection)
+                connection.connection = None
+            setup_worker_connection(connection, index + 1)
+        self._shard = (index, inboxes, pending_urls)
+        self.urls = self.create_frontier(self.processes)
+        if self.report is not None:
+            self.report.records = []
+        error = None
+        try:
+            while True:
+                self._receive_urls(block=not self.urls)
+                if self.urls:
+                    url_with_referer = self.urls.pop()
+                    try:
+                        self._call_request(url_with_referer)
+                    finally:
+                        if self.urls.is_exhausted:
+                            # URLs over the limit are never crawled
+                            self._update_pending_urls(-self.urls.clear())
+                        self._update_pending_urls(-1)
+                elif self._update_pending_urls(0) == 0:
+                    break
+        except Exception as e:
+            error = self._get_shard_error(e)
+        finally:
+            connections.close_all()
+            results_queue.put(
+                {
+                    "crawled_urls": list(self.crawled_urls),
+                    "report_records": (
+                        self.report.records if self.report is not None else []
+                    ),
+                    "error": error,
+                }
+            )
+        if error is not None:
+            sys.exit(1)
+
+    def _add_url(self, url_with_referer):
+        if self._shard is None:
+            self.urls.add(url_with_referer)
+            return
+
+        index, inboxes, _ = self._shard
+        shard_index = self._get_shard_index(url_with_referer.url)
+        if shard_index == index:
+            if not self.urls.is_exhausted and self.urls.add(url_with_referer):
+                self._update_pending_urls(1)
+        else:
+            self._update_pending_urls(1)
+            inboxes[shard_index].put(
+                (url_with_referer.url, url_with_referer.referer, url_with_referer.depth)
+            )
+
+    def _pop_url(self):
+        """
+        Wait for the URL in the frontier. None is returned if the frontier is empty and no request is running
+        (running request can add new URLs) or if a worker failed.
+        """
+        with self._frontier_condition:
+            while (
+                not self.urls and self._pending_requests and not self._worker_exceptions
+            ):
+                self._frontier_condition.wait()
+            if not self.urls or self._worker_exceptions:
+                return None
+            self._pending_requests += 1
+            url_with_referer = self.urls.pop()
+            self._running_urls.add(url_with_referer)
+            return url_with_referer
 
+    def _process_url(self, url_with_referer, client):
+        try:
+            self._call_request(url_with_referer, client)
+        except Exception as e:
+            # Other workers must stop before they pop URLs added by the failed request
+            with self._frontier_condition:
+                self._worker_exceptions.append(e)
+            raise
+        finally:
+            with self._frontier_condition:
+                self._pending_requests -= 1
+                self._running_urls.discard(url_with_referer)
+                self._finished_requests += 1
                 if (
-                    "django.contrib.staticfiles" in settings.INSTALLED_APPS
-                    and parsed_href.path.startswith(settings.STATIC_URL)
+                    self.checkpoint
+                    and self._finished_requests % self.checkpoint_interval == 0
                 ):
-                    LOG.debug("Skipping static file %s", parsed_href.path)
-                elif parsed_href.path.startswith(settings.MEDIA_URL):
-                    LOG.debug("Skipping media file %s", parsed_href.path)
-                elif parsed_href.path.startswith("/"):
+                    self.save_checkpoint()
+                self._frontier_condition.notify_all()
+
+    def _run_worker(self, client):
+        try:
+            while True:
+                url_with_referer = self._pop_url()
+                if url_with_referer is None:
+                    return
+                self._process_url(url_with_referer, client)
+        except Exception as e:
+            with self._frontier_condition:
+                if e not in self._worker_exceptions:
+                    self._worker_exceptions.append(e)
+                self._frontier_condition.notify_all()
+        finally:
+            # Every thread has its own database connections
+            connections.close_all()
+
+    def _get_skipped_path_prefixes(self):
+        """
+        Static and media files are not crawled.
+        """
+        prefixes = []
+        if "django.contrib.staticfiles" in settings.INSTALLED_APPS and getattr(
+            settings, "STATIC_URL", None
+        ):
+            prefixes.append(settings.STATIC_URL)
+        if settings.MEDIA_URL:
+            prefixes.append(settings.MEDIA_URL)
+        return ExcludeMatcher(prefixes=prefixes)
+
+    def _get_link_type(self, link):
+        """
+        Return "absolute" for the internal links with absolute path, "relative" for the internal links with relative
+        path or None if the link should be skipped.
+        """
+        parsed_href = urlparse(link)
+
+        if not parsed_href.path:
+            return None
+
+        if parsed_href.scheme and not parsed_href.netloc.startswith("testserver"):
+            LOG.debug("Skipping external link: %s", link)
+            return None
+
+        if self.skipped_path_prefixes.match(parsed_href.path):
+            LOG.debug("Skipping static or media file %s", parsed_href.path)
+            return None
+        elif parsed_href.path.startswith("/"):
+            return "absolute"
+        else:
+            return "relative"
+
+    def _parse_urls(self, url, resp):
+        returned_urls = []
+        content_type = resp["Content-Type"].split(";")[0]
+        if content_type in self.link_extractors:
+            link_extractor = self.link_extractors.get(
+                content_type, self.link_extractors["default"]
+            )
+            if hasattr(link_extractor, "extract_from_response"):
+                links = link_extractor.extract_from_response(resp)
+            else:
+                # Extractors which don't inherit LinkExtractor implement only extract
+                links = LinkExtractor.extract_from_response(link_extractor, resp)
+            for link in links:
+                link_type = self._get_link_type(link)
+                if link_type == "absolute":
                     returned_urls.append(link)
-                else:
+                elif link_type == "relative":
                     # We'll use urlparse's urljoin since that handles things like <a href="../foo">
                     returned_urls.append(urljoin(url, link))
 
@@ -142,35 +1238,55 @@ class Crawler:
 
     def _pre_request(self, url, referer, headers):
         if self.pre_request:
-            self.pre_request(url, referer, headers)
+            # Hooks are never called concurrently
+            with self._hooks_lock:
+                self.pre_request(url, referer, headers)
 
         return url, headers
 
     def _post_response(self, url, referer, resp=None, exception=None):
+        if self.checkpoint:
+            with self._frontier_condition:
+                self._new_results[url] = (
+                    url,
+                    referer,
+                    resp.status_code if resp is not None else None,
+                    repr(exception) if exception is not None else None,
+                )
         if self.post_response:
-            self.post_response(url, referer, resp, exception)
+            with self._hooks_lock:
+                self.post_response(url, referer, resp, exception)
+
+    def _add_crawled_url(self, url):
+        if self.checkpoint and url not in self.crawled_urls:
+            self._new_crawled_urls.append(url)
+        self.crawled_urls.add(url)
+        self.urls.mark_seen(url)
 
-    def _call_request(self, url_with_referer):
+    def _call_request(self, url_with_referer, client=None):
+        client = client or self.client
         url, referer = url_with_referer.url, url_with_referer.referer
         resp = None
         try:
             url, headers = self._pre_request(url, referer, {})
-            resp = self.client.get(url, follow=True, **headers)
-            self.crawled_urls.add(url)
-            if resp.redirect_chain:
-                self.crawled_urls.update(
-                    (redirect_url for redirect_url, _ in resp.redirect_chain)
+            if self.report is not None:
+                resp = self.report.request(
+                    url, referer, lambda: client.get(url, follow=True, **headers)
                 )
-            for parsed_url in self._parse_urls(url, resp):
-                if (
-                    parsed_url not in self.crawled_urls
-                    and parsed_url not in self.urls
-                    and not any(
-                        excluded_urls_regex.match(parsed_url)
-                        for excluded_urls_regex in self.excluded_urls_regexs
-                    )
-                ):
-                    self.urls.add(URLWithReferer(parsed_url, url))
+            else:
+                resp = client.get(url, follow=True, **headers)
+            parsed_urls = self._parse_urls(url, resp)
+            with self._frontier_condition:
+                self._add_crawled_url(url)
+                for redirect_url, _ in resp.redirect_chain or ():
+                    self._add_crawled_url(redirect_url)
+                for parsed_url in parsed_urls:
+                    if not self.exclude_matcher.match(parsed_url):
+                        self._add_url(
+                            URLWithReferer(
+                                parsed_url, url, depth=url_with_referer.depth + 1
+                            )
+                        )
             self._post_response(url, referer, resp)
         except Exception as e:
             LOG.exception("%s had unhandled exception: %s", url, e)
@@ -1,15 +1,18 @@
 import types
 
+from collections import defaultdict
 from collections.abc import Iterable
-from functools import wraps
+from functools import partial, wraps
 
 from inspect import isclass, isfunction, ismethod, getfullargspec, signature
 
-from django.db import transaction
+from django.db import connections, transaction
 from django.db.models import Model
 from django.db.models.fields import DateField, DateTimeField
 from django.utils.functional import cached_property
 
+from germanium.config import DATA_CONSUMER_LAZY_ROLLBACK
+
 try:
     import responses
 
@@ -26,15 +29,117 @@ def is_iterable(data):
     return isinstance(data, Iterable) and not isinstance(data, str)
 
 
-def refresh_model_object(obj):
-    obj.refresh_from_db()
+def _clear_cached_properties(obj):
     for key, value in obj.__class__.__dict__.items():
         if isinstance(value, cached_property):
             obj.__dict__.pop(key, None)
 
 
-def refresh_model_objects(*data):
-    [refresh_model_object(obj) for obj in data if isinstance(obj, Model) and obj.pk]
+def refresh_model_object(obj):
+    obj.refresh_from_db()
+    _clear_cached_properties(obj)
+
+
+def _copy_cached_value(field, obj, db_instance):
+    # Related objects loaded with select_related are kept, other cached relations are cleared
+    if field.is_cached(db_instance):
+        field.set_cached_value(obj, field.get_cached_value(db_instance))
+    elif field.is_cached(obj):
+        field.delete_cached_value(obj)
+
+
+def _refresh_model_object_from_db_instance(obj, db_instance):
+    deferred_fields = obj.get_deferred_fields()
+    obj._prefetched_objects_cache = {}
+    for field in obj._meta.concrete_fields:
+        if field.attname in deferred_fields:
+            continue
+        setattr(obj, field.attname, getattr(db_instance, field.attname))
+        if field.is_relation:
+            _copy_cached_value(field, obj, db_instance)
+    for rel in obj._meta.related_objects:
+        _copy_cached_value(rel, obj, db_instance)
+    for field in obj._meta.private_fields:
+        if field.is_relation and field.is_cached(obj):
+            field.delete_cached_value(obj)
+    obj._state.db = db_instance._state.db
+    _clear_cached_properties(obj)
+
+
+def refresh_model_objects(*data, select_related=()):
+    """
+    Reload model objects from the database with one query per model and database. Related objects from
+    select_related are loaded with the same query. Objects of the models which override refresh_from_db are
+    refreshed with their refresh_from_db method.
+    """
+    objs_by_model_and_db = defaultdict(lambda: defaultdict(list))
+    for obj in data:
+        if not isinstance(obj, Model) or not obj.pk:
+            continue
+        model = type(obj)
+        if model.refresh_from_db is not Model.refresh_from_db:
+            refresh_model_object(obj)
+        else:
+            # Primary keys are normalized to the type returned from the database (for example "1" of integer field)
+            pk = model._meta.pk.to_python(obj.pk)
+            objs_by_model_and_db[model, obj._state.db][pk].append(obj)
+
+    for (model, db), objs_by_pk in objs_by_model_and_db.items():
+        db_instances = (
+            model._base_manager.db_manager(db)
+            .select_related(*select_related)
+            .in_bulk(list(objs_by_pk))
+        )
+        for pk, objs in objs_by_pk.items():
+            if pk not in db_instances:
+                raise model.DoesNotExist(
+                    f"{model._meta.object_name} matching query does not exist."
+                )
+            for obj in objs:
+                _refresh_model_object_from_db_instance(obj, db_instances[pk])
+
+
+def is_read_only_sql(sql):
+    return str(sql).lstrip()[:7].upper().startswith(("SELECT", "EXPLAIN", "SHOW"))
+
+
+class DatabasesSavepoint:
+    """
+    Savepoint of all test databases. With lazy set the savepoint of the database is created just before the first
+    statement of the database which can change data (every statement except SELECT, EXPLAIN and SHOW), therefore
+    read only code is run without savepoints. Method rollback returns True if any savepoint was rolled back.
+    """
+
+    def __init__(self, databases, lazy=False):
+        self.databases = list(databases)
+        self.lazy = lazy
+        self.sids = {}
+        self._execute_wrappers = []
+
+    def _lazy_savepoint_wrapper(self, db, execute, sql, params, many, context):
+        if db not in self.sids and not is_read_only_sql(sql):
+            # The savepoint statement is executed via the same wrapper
+            self.sids[db] = None
+            self.sids[db] = transaction.savepoint(using=db)
+        return execute(sql, params, many, context)
+
+    def start(self):
+        if self.lazy:
+            for db in self.databases:
+                execute_wrapper = partial(self._lazy_savepoint_wrapper, db)
+                connections[db].execute_wrappers.append(execute_wrapper)
+                self._execute_wrappers.append((db, execute_wrapper))
+        else:
+            self.sids = {db: transaction.savepoint(using=db) for db in self.databases}
+
+    def rollback(self):
+        for db, execute_wrapper in self._execute_wrappers:
+            connections[db].execute_wrappers.remove(execute_wrapper)
+        self._execute_wrappers = []
+        sids, self.sids = self.sids, {}
+        for db, sid in sids.items():
+            transaction.savepoint_rollback(sid, using=db)
+        return bool(sids)
 
 
 def login(function=None, users_generator="get_user", **users_kwargs):
@@ -198,7 +303,9 @@ def call(callable, self, data, named_data=None, default_args=None, default_kwarg
         return callable(*function_or_method_args, *data, **function_or_method_kwargs)
 
 
-def call_test_method(method, self, data, named_data, use_rollback=False):
+def call_test_method(
+    method, self, data, named_data, use_rollback=False, lazy_rollback=False
+):
     if not named_data and isinstance(data, NamedTestData):
         named_data = NamedTestData(**data.data)
     elif named_data and isinstance(data, NamedTestData):
@@ -208,9 +315,9 @@ def call_test_method(method, self, data, named_data, use_rollback=False):
 
     databases = self._databases_names() if hasattr(self, "_databases_names") else []
     is_data_consumer = getattr(method, "is_data_consumer", False)
-    sids = []
+    savepoint = DatabasesSavepoint(databases, lazy=lazy_rollback)
     if use_rollback:
-        sids = [transaction.savepoint(using=db) for db in databases]
+        savepoint.start()
     try:
         if is_data_consumer:
             method(self, data=data, named_data=named_data)
@@ -220,12 +327,16 @@ def call_test_method(method, self, data, named_data, use_rollback=False):
             call(method, self, ((data,) if not is_iterable(data) else data), named_data)
     finally:
         if use_rollback:
-            for sid, db in zip(sids, databases):
-                transaction.savepoint_rollback(sid, using=db)
+            is_rolled_back = savepoint.rollback()
             reset_responses()
-            refresh_model_objects(
-                *(data.data.values() if isinstance(data, NamedTestData) else data)
-            )
+            objs = data.data.values() if isinstance(data, NamedTestData) else data
+            if not lazy_rollback:
+                for obj in objs:
+                    if isinstance(obj, Model) and obj.pk:
+                        refresh_model_object(obj)
+            elif is_rolled_back:
+                # Objects are refreshed with one query per model
+                refresh_model_objects(*objs)
         if not is_data_consumer and hasattr(self, "tear_down_data_consumer"):
             self.tear_down_data_consumer()
 
@@ -267,12 +378,19 @@ def data_consumer(
                                      the test case class
         *data_provider_args: arguments for the data provider
         **data_provider_kwargs: arguments for the data provider kwargs
+        _output_name: name or list of names of the data provider output
+        _lazy_rollback: savepoint of the test run with the generated data is created only if the test changes data
+                        in the database, model objects are refreshed only after the rollback (the default value is
+                        set with the setting GERMANIUM_DATA_CONSUMER_LAZY_ROLLBACK)
 
     Returns:
         Data created by data provider
     """
 
     output_name = data_provider_kwargs.pop("_output_name", None)
+    lazy_rollback = data_provider_kwargs.pop(
+        "_lazy_rollback", DATA_CONSUMER_LAZY_ROLLBACK
+    )
 
     def test_decorator(fn):
         def get_data(self, last_data, named_data=None):
@@ -330,6 +448,7 @@ def data_consumer(
                     data,
                     _copy_named_data(named_data),
                     use_rollback=use_rollback,
+                    lazy_rollback=lazy_rollback,
                 )
 
         wrapper = wraps(fn)(repl)
@@ -341,6 +460,15 @@ def data_consumer(
     return test_decorator
 
 
+def profile_test(function_or_class):
+    """
+    Mark test method or all tests of the test case class to be profiled if the test runner option
+    --germanium-profile is set. The test is not changed, therefore the decorator has no cost without profiling.
+    """
+    function_or_class.is_profiled = True
+    return function_or_class
+
+
 def turn_off_auto_now(model_class, field_name):
 
     def _turn_off_auto_now(function):
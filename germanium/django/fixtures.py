@@ -0,0 +1,357 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from collections import defaultdict
+from itertools import groupby
+
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.core.management.commands import loaddata
+from django.core.serializers import python
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    connections,
+    router,
+    transaction,
+)
+
+LOG = logging.getLogger("tests")
+
+CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally yields items of the JSON array stored in the file. Only one chunk and the currently parsed item are
+    kept in the memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size)
+    position = 0
+    eof = not buffer
+    expected = "["
+    while True:
+        while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+            position += 1
+
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of the JSON fixture")
+            buffer, position = f.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        char = buffer[position]
+        if expected == "[":
+            if char != "[":
+                raise ValueError("JSON fixture must contain an array of objects")
+            position += 1
+            expected = "value or ]"
+        elif expected in {", or ]", "value or ]"} and char == "]":
+            return
+        elif expected == ", or ]":
+            if char != ",":
+                raise ValueError(
+                    "Invalid JSON fixture, expected {} got {}".format(expected, char)
+                )
+            position += 1
+            expected = "value"
+        else:
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The item is not complete, read next chunk
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield obj
+            expected = ", or ]"
+
+
+def iter_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+FIXTURE_READERS = {
+    ".json": iter_json_array,
+    ".jsonl": iter_jsonl,
+}
+
+
+def find_fixture_files(fixture_label, using=DEFAULT_DB_ALIAS):
+    """
+    Return paths of the fixture files of the fixture label. Files are searched in the same way as the loaddata
+    command does (fixtures directories of the apps, FIXTURE_DIRS and the current directory).
+    """
+    command = loaddata.Command()
+    command.using = using
+    command.app_label = None
+    command.format = None
+    command.verbosity = 0
+    command.serialization_formats = serializers.get_public_serializer_formats()
+    return [fixture_file for fixture_file, _, _ in command.find_fixtures(fixture_label)]
+
+
+def resolve_fixtures(fixtures, using=DEFAULT_DB_ALIAS):
+    """
+    Return paths of the fixture files, fixture labels are replaced with the found fixture files.
+    """
+    return [
+        fixture_file
+        for fixture in fixtures
+        for fixture_file in (
+            (fixture,)
+            if os.path.isfile(fixture)
+            else find_fixture_files(fixture, using)
+        )
+    ]
+
+
+def is_bulk_fixture(fixture):
+    return (
+        os.path.isfile(fixture)
+        and os.path.splitext(fixture)[1].lower() in FIXTURE_READERS
+    )
+
+
+def iter_fixture_objects(fixture):
+    reader = FIXTURE_READERS[os.path.splitext(fixture)[1].lower()]
+    with open(fixture, encoding="utf-8") as f:
+        yield from reader(f)
+
+
+fixture_digests = {}
+fixture_snapshots = {}
+
+
+def get_fixture_digest(fixture):
+    """
+    Return hash of the fixture file contents. The hash is computed again only if file mtime or size is changed.
+    """
+    stat = os.stat(fixture)
+    digest_key = (os.path.abspath(fixture), stat.st_mtime_ns, stat.st_size)
+    if digest_key not in fixture_digests:
+        fixture_hash = hashlib.sha256()
+        with open(fixture, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                fixture_hash.update(chunk)
+        fixture_digests[digest_key] = fixture_hash.hexdigest()
+    return fixture_digests[digest_key]
+
+
+def get_fixture_snapshot(fixture):
+    """
+    Return parsed objects of the fixture. Fixture file is parsed only once per process, the snapshot is keyed by
+    the file contents, therefore changed fixture is never loaded from the old snapshot.
+    """
+    digest = get_fixture_digest(fixture)
+    if digest not in fixture_snapshots:
+        fixture_snapshots[digest] = tuple(iter_fixture_objects(fixture))
+    return fixture_snapshots[digest]
+
+
+def sort_models_by_dependencies(models):
+    """
+    Sort models that the models referenced with foreign keys are before the referencing models.
+    """
+    models = list(models)
+    model_set = set(models)
+    sorted_models = []
+    visited = set()
+
+    def visit(model, path):
+        if model in visited or model in path:
+            return
+        path.add(model)
+        for field in model._meta.concrete_fields:
+            related_model = field.related_model if field.is_relation else None
+            if related_model is not None and related_model in model_set:
+                visit(related_model, path)
+        path.discard(model)
+        visited.add(model)
+        sorted_models.append(model)
+
+    for model in models:
+        visit(model, set())
+    return sorted_models
+
+
+class ModelStats:
+
+    def __init__(self):
+        self.rows = 0
+        self.duration = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.duration if self.duration else float(self.rows)
+
+
+class BulkFixtureLoader:
+    """
+    Loads fixture objects with bulk_create in batches. Objects are buffered by the model and the batch is inserted
+    when it is full. Rest of the objects is inserted with flush in the order of model dependencies. Constraint checks
+    must be disabled during the loading because the batches of the different models are inserted in arbitrary order.
+
+    Model signals are not sent. Multi-table inherited models and batches which conflict with the existing rows are
+    saved object by object in the same way as loaddata does.
+    """
+
+    def __init__(self, using, batch_size=1000):
+        self.using = using
+        self.connection = connections[using]
+        self.batch_size = batch_size
+        self.batches = defaultdict(list)
+        self.deferred_objects = []
+        self.stats = defaultdict(ModelStats)
+
+    def load(self, objects):
+        for deserialized_obj in python.Deserializer(
+            objects, using=self.using, handle_forward_references=True
+        ):
+            model = type(deserialized_obj.object)
+            if not router.allow_migrate_model(self.using, model):
+                continue
+
+            if deserialized_obj.deferred_fields:
+                self.deferred_objects.append(deserialized_obj)
+
+            batch = self.batches[model]
+            batch.append(deserialized_obj)
+            if len(batch) >= self.batch_size:
+                self._flush(model)
+
+    def flush(self):
+        for model in sort_models_by_dependencies(self.batches.keys()):
+            self._flush(model)
+
+        for deserialized_obj in self.deferred_objects:
+            deserialized_obj.save_deferred_fields(using=self.using)
+        self.deferred_objects = []
+
+    def finish(self):
+        """
+        Check constraints of the loaded tables and reset its sequences. Must be called with enabled constraint checks.
+        """
+        models = list(self.stats.keys())
+        if models:
+            self._reset_sequences(models)
+            self.connection.check_constraints(
+                table_names=[model._meta.db_table for model in models]
+            )
+        for model, stats in self.stats.items():
+            LOG.info(
+                "Loaded %d rows of %s (%.0f rows/s)",
+                stats.rows,
+                model._meta.label,
+                stats.rows_per_second,
+            )
+
+    def _flush(self, model):
+        batch = self.batches.pop(model, None)
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        if model._meta.parents or (
+            not self.connection.features.can_return_rows_from_bulk_insert
+            and any(deserialized_obj.object.pk is None for deserialized_obj in batch)
+        ):
+            # bulk_create doesn't support multi-table inheritance and primary keys are required for M2M relations
+            self._save_objects(batch)
+        else:
+            try:
+                with transaction.atomic(using=self.using):
+                    self._bulk_create(model, batch)
+            except IntegrityError:
+                # Rows already exist (for example created by a data migration), they are updated with save
+                self._save_objects(batch)
+
+        stats = self.stats[model]
+        stats.rows += len(batch)
+        stats.duration += time.perf_counter() - start
+
+    def _bulk_create(self, model, batch):
+        model._base_manager.using(self.using).bulk_create(
+            [deserialized_obj.object for deserialized_obj in batch]
+        )
+
+        through_objs = defaultdict(list)
+        for deserialized_obj in batch:
+            for field_name, values in (deserialized_obj.m2m_data or {}).items():
+                field = model._meta.get_field(field_name)
+                through = field.remote_field.through
+                source_attname = through._meta.get_field(field.m2m_field_name()).attname
+                target_attname = through._meta.get_field(
+                    field.m2m_reverse_field_name()
+                ).attname
+                through_objs[through].extend(
+                    through(
+                        **{
+                            source_attname: deserialized_obj.object.pk,
+                            target_attname: value,
+                        }
+                    )
+                    for value in values
+                )
+
+        for through, objs in through_objs.items():
+            through._base_manager.using(self.using).bulk_create(
+                objs, batch_size=self.batch_size
+            )
+
+        for deserialized_obj in batch:
+            # M2M relations are saved, deferred fields must not save them again
+            deserialized_obj.m2m_data = None
+
+    def _save_objects(self, batch):
+        for deserialized_obj in batch:
+            deserialized_obj.save(using=self.using)
+
+    def _reset_sequences(self, models):
+        sequence_sql = self.connection.ops.sequence_reset_sql(no_style(), models)
+        if sequence_sql:
+            with self.connection.cursor() as cursor:
+                for line in sequence_sql:
+                    cursor.execute(line)
+
+
+def load_fixtures(using, fixtures, batch_size=1000, snapshot=False):
+    """
+    Load JSON and JSONL fixture files with the BulkFixtureLoader. Fixture labels are resolved to the fixture files
+    in the same way as loaddata does, other fixture files (different formats or compressed fixtures) are loaded
+    with loaddata command. Fixtures are loaded in the declared order, every run of consecutive JSON fixture files
+    is loaded with one bulk loader flush and every run of other fixtures with one loaddata call. Constraints of
+    the bulk loaded tables are checked at the end. If snapshot is True, fixture files are parsed only once and
+    objects are loaded from the in-memory snapshot next time.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        loader = BulkFixtureLoader(using, batch_size=batch_size)
+        for is_bulk, fixtures_group in groupby(
+            resolve_fixtures(fixtures, using), key=is_bulk_fixture
+        ):
+            if is_bulk:
+                with connection.constraint_checks_disabled():
+                    for fixture in fixtures_group:
+                        loader.load(
+                            get_fixture_snapshot(fixture)
+                            if snapshot
+                            else iter_fixture_objects(fixture)
+                        )
+                    loader.flush()
+            else:
+                call_command("loaddata", *fixtures_group, verbosity=0, database=using)
+        loader.finish()
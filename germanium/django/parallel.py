@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+from django.test.runner import ParallelTestSuite
+from django.test.runner import _run_subsuite as django_run_subsuite
+
+from germanium.profiling import n_plus_one_detector, test_profiler, test_timings
+
+SUBSUITE_FINISHED_EVENT = "germanium_subsuite_finished"
+
+
+def get_test_label(test):
+    return "{}.{}".format(type(test).__module__, type(test).__qualname__)
+
+
+def get_subsuite_label(subsuite):
+    return get_test_label(next(iter(subsuite)))
+
+
+def _process_setup(worker_options=None):
+    """
+    Turn on Germanium instrumentation in the worker process.
+    """
+    worker_options = worker_options or {}
+    if worker_options.get("test_timings"):
+        test_timings.enable()
+    if worker_options.get("test_profiler"):
+        test_profiler.enable(**worker_options["test_profiler"])
+    if worker_options.get("n_plus_one_detector"):
+        n_plus_one_detector.enable(**worker_options["n_plus_one_detector"])
+
+
+def _run_subsuite(args):
+    """
+    Run the subsuite with the Django implementation and append event with data collected in the worker process.
+    """
+    start = time.perf_counter()
+    subsuite_index, events = django_run_subsuite(args)
+    data = {"duration": time.perf_counter() - start}
+    if test_timings.enabled:
+        data["test_timings"] = test_timings.pop_records()
+    if test_profiler.enabled:
+        data["test_profiler"] = test_profiler.pop_data()
+    if n_plus_one_detector.enabled:
+        data["n_plus_one_detector"] = n_plus_one_detector.pop_findings()
+    events.append((SUBSUITE_FINISHED_EVENT, -1, data))
+    return subsuite_index, events
+
+
+class TestDurations:
+    """
+    History of test case classes durations stored in a local JSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.durations = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.durations = json.load(f)
+
+    def __bool__(self):
+        return bool(self.durations)
+
+    def update(self, label, duration):
+        self.durations[label] = duration
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.durations, f, indent=2, sort_keys=True)
+
+    def sort(self, subsuites):
+        """
+        Sort subsuites from the longest to the shortest. Workers take subsuites in this order when they are free,
+        therefore the slowest test cases don't end up at the end of the run (longest-processing-time-first).
+        Test cases without history get the average duration.
+        """
+        if not self.durations:
+            return subsuites
+
+        default_duration = sum(self.durations.values()) / len(self.durations)
+        return sorted(
+            subsuites,
+            key=lambda subsuite: self.durations.get(
+                get_subsuite_label(subsuite), default_duration
+            ),
+            reverse=True,
+        )
+
+
+class GermaniumParallelResult:
+    """
+    Test result wrapper which receives the worker data event. Django dispatches worker events to the result method of
+    the same name (Django < 5.0 does it directly in ParallelTestSuite.run without the handle_event hook).
+    """
+
+    def __init__(self, result, suite):
+        self._result = result
+        self._suite = suite
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+    def germanium_subsuite_finished(self, test, data):
+        self._suite.handle_subsuite_finished(test, data)
+
+
+class GermaniumParallelTestSuite(ParallelTestSuite):
+
+    process_setup = _process_setup
+    run_subsuite = _run_subsuite
+    test_durations = None
+
+    def run(self, result):
+        super().run(GermaniumParallelResult(result, self))
+        return result
+
+    def handle_subsuite_finished(self, test, data):
+        """
+        Process data collected in the worker process. Test is any test of the subsuite, subsuites are partitioned by
+        the test case class.
+        """
+        if self.test_durations is not None:
+            self.test_durations.update(get_test_label(test), data["duration"])
+        if "test_timings" in data:
+            test_timings.add_records(data["test_timings"])
+        if "test_profiler" in data:
+            test_profiler.add_data(data["test_profiler"])
+        if "n_plus_one_detector" in data:
+            n_plus_one_detector.add_findings(data["n_plus_one_detector"])
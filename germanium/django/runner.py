@@ -1,13 +1,121 @@
 from django.test.runner import DiscoverRunner
 
+from germanium.config import N_PLUS_ONE_THRESHOLD, TEST_DURATIONS_FILE
+from germanium.profiling import n_plus_one_detector, test_profiler, test_timings
+
+from .parallel import GermaniumParallelTestSuite, TestDurations
 from .utils import setup_databases
 
 
 class GermaniumRunnerMixin:
 
+    parallel_test_suite = GermaniumParallelTestSuite
+
     def __init__(self, **kwargs):
         self.refreshdb = kwargs.pop("refreshdb", False)
+        self.germanium_timings = kwargs.pop("germanium_timings", None)
+        self.germanium_slowest = kwargs.pop("germanium_slowest", None)
+        self.germanium_profile = kwargs.pop("germanium_profile", None)
+        self.germanium_profile_format = kwargs.pop("germanium_profile_format", "pstats")
+        self.germanium_profile_all = kwargs.pop("germanium_profile_all", False)
+        self.germanium_n_plus_one = kwargs.pop("germanium_n_plus_one", None)
+        self.germanium_n_plus_one_threshold = kwargs.pop(
+            "germanium_n_plus_one_threshold", None
+        )
+        self.germanium_n_plus_one_baseline = kwargs.pop(
+            "germanium_n_plus_one_baseline", None
+        )
+        self.germanium_n_plus_one_fail = kwargs.pop("germanium_n_plus_one_fail", False)
         super().__init__(**kwargs)
+        self.test_durations = (
+            TestDurations(TEST_DURATIONS_FILE) if TEST_DURATIONS_FILE else None
+        )
+
+    @property
+    def test_timings_enabled(self):
+        return bool(self.germanium_timings or self.germanium_slowest)
+
+    def get_test_profiler_options(self):
+        if not self.germanium_profile:
+            return None
+        return {
+            "format": self.germanium_profile_format,
+            "profile_all": self.germanium_profile_all,
+        }
+
+    def get_n_plus_one_detector_options(self):
+        if not self.germanium_n_plus_one:
+            return None
+        return {
+            "threshold": (
+                N_PLUS_ONE_THRESHOLD
+                if self.germanium_n_plus_one_threshold is None
+                else self.germanium_n_plus_one_threshold
+            )
+        }
+
+    def get_worker_options(self):
+        return {
+            "test_timings": self.test_timings_enabled,
+            "test_profiler": self.get_test_profiler_options(),
+            "n_plus_one_detector": self.get_n_plus_one_detector_options(),
+        }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if self.test_timings_enabled:
+            test_timings.enable()
+        if self.germanium_profile:
+            test_profiler.enable(**self.get_test_profiler_options())
+        if self.germanium_n_plus_one:
+            n_plus_one_detector.enable(**self.get_n_plus_one_detector_options())
+
+    def teardown_test_environment(self, **kwargs):
+        test_timings.disable()
+        test_profiler.disable()
+        n_plus_one_detector.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        if isinstance(suite, GermaniumParallelTestSuite):
+            suite.process_setup_args = (self.get_worker_options(),)
+            if self.test_durations is not None:
+                # Shuffled tests should not be sorted
+                if getattr(self, "shuffle", False) is False:
+                    suite.subsuites = self.test_durations.sort(suite.subsuites)
+                suite.test_durations = self.test_durations
+        return suite
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        if (
+            isinstance(suite, GermaniumParallelTestSuite)
+            and suite.test_durations is not None
+        ):
+            suite.test_durations.save()
+        if self.germanium_timings:
+            test_timings.write_report(self.germanium_timings)
+        if self.germanium_slowest:
+            test_timings.print_slowest(self.germanium_slowest)
+        if self.germanium_profile:
+            test_profiler.write(self.germanium_profile)
+        if self.germanium_n_plus_one:
+            # The baseline can be the report file of the previous run
+            self.n_plus_one_offenders = n_plus_one_detector.get_new_offenders(
+                self.germanium_n_plus_one_baseline
+            )
+            n_plus_one_detector.write_report(self.germanium_n_plus_one)
+            n_plus_one_detector.print_offenders(
+                self.n_plus_one_offenders, fail=self.germanium_n_plus_one_fail
+            )
+        return result
+
+    def suite_result(self, suite, result, **kwargs):
+        failures = super().suite_result(suite, result, **kwargs)
+        if self.germanium_n_plus_one_fail:
+            failures += len(getattr(self, "n_plus_one_offenders", ()))
+        return failures
 
     def setup_databases(self, **kwargs):
         return setup_databases(
@@ -16,6 +124,7 @@ class GermaniumRunnerMixin:
             self.keepdb and not self.refreshdb,
             self.debug_sql,
             self.parallel,
+            time_keeper=getattr(self, "time_keeper", None),
             **kwargs
         )
 
@@ -27,6 +136,54 @@ class GermaniumRunnerMixin:
             action="store_true",
             help="Tells Django to refresh test database even if keepdb is turned on.",
         )
+        parser.add_argument(
+            "--germanium-timings",
+            metavar="PATH",
+            help="Writes wall time, CPU time and queries of test phases to the JSON or CSV (.csv extension) file.",
+        )
+        parser.add_argument(
+            "--germanium-slowest",
+            metavar="N",
+            type=int,
+            help="Prints N slowest tests and test cases with duration of their phases.",
+        )
+        parser.add_argument(
+            "--germanium-profile",
+            metavar="PATH",
+            help="Profiles tests marked with the profile_test decorator and writes merged results to the file.",
+        )
+        parser.add_argument(
+            "--germanium-profile-format",
+            choices=("pstats", "collapsed"),
+            default="pstats",
+            help="Format of the profile output, pstats (cProfile) or collapsed stacks for flame graphs.",
+        )
+        parser.add_argument(
+            "--germanium-profile-all",
+            action="store_true",
+            help="Profiles all tests with the --germanium-profile option.",
+        )
+        parser.add_argument(
+            "--germanium-n-plus-one",
+            metavar="PATH",
+            help="Detects N+1 queries in all tests and writes ranked offenders to the JSON file.",
+        )
+        parser.add_argument(
+            "--germanium-n-plus-one-threshold",
+            metavar="N",
+            type=int,
+            help="Maximal number of queries with the same fingerprint and call site in one request or test.",
+        )
+        parser.add_argument(
+            "--germanium-n-plus-one-baseline",
+            metavar="PATH",
+            help="JSON report of the known N+1 offenders which are allowed.",
+        )
+        parser.add_argument(
+            "--germanium-n-plus-one-fail",
+            action="store_true",
+            help="Exits with the non-zero status if new N+1 offenders are found.",
+        )
 
 
 class GermaniumDiscoverRunner(GermaniumRunnerMixin, DiscoverRunner):
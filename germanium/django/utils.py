@@ -1,7 +1,204 @@
+import hashlib
+import os
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
 from django.core.management import call_command
 from django.conf import settings
-from django.db import connections
-from django.test.utils import get_unique_databases_and_mirrors
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.loader import MigrationLoader
+from django.test.utils import NullTimeKeeper, get_unique_databases_and_mirrors
+
+from germanium.config import (
+    BULK_GLOBAL_FIXTURES,
+    CHECK_TEST_DB_HASH,
+    FIXTURES_BATCH_SIZE,
+    PARALLEL_DB_CLONING,
+)
+
+from .fixtures import load_fixtures, resolve_fixtures
+
+TEST_DB_STATE_TABLE = "germanium_test_db_state"
+
+
+def _update_hash_with_file(test_db_hash, path):
+    test_db_hash.update(path.encode("utf-8"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            test_db_hash.update(chunk)
+
+
+def get_test_db_hash(fixtures=None, using=DEFAULT_DB_ALIAS):
+    """
+    Return hash of the migration files (or models of the apps without migrations) and the global fixtures (fixture
+    labels are resolved to the fixture files in the same way as loaddata does). The hash is stored in the kept test
+    database, the database is rebuilt only if the hash is changed.
+    """
+    test_db_hash = hashlib.sha256()
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    for key, migration in sorted(loader.disk_migrations.items()):
+        test_db_hash.update("{}.{}".format(*key).encode("utf-8"))
+        _update_hash_with_file(test_db_hash, sys.modules[migration.__module__].__file__)
+
+    for app_label in sorted(loader.unmigrated_apps):
+        models_module = apps.get_app_config(app_label).models_module
+        if models_module is not None:
+            _update_hash_with_file(test_db_hash, models_module.__file__)
+
+    for fixture in resolve_fixtures(fixtures or (), using):
+        _update_hash_with_file(test_db_hash, fixture)
+    return test_db_hash.hexdigest()
+
+
+def _count_rows(connection, cursor, chunk_size=100):
+    """
+    Global fixtures are removed from the database with every flush (TransactionTestCase), therefore number of rows
+    is stored with the hash too.
+    """
+    table_names = sorted(
+        connection.introspection.django_table_names(
+            only_existing=True, include_views=False
+        )
+    )
+    row_count = 0
+    for i in range(0, len(table_names), chunk_size):
+        cursor.execute(
+            " UNION ALL ".join(
+                "SELECT COUNT(*) FROM {}".format(connection.ops.quote_name(table_name))
+                for table_name in table_names[i : i + chunk_size]
+            )
+        )
+        row_count += sum(count for count, in cursor.fetchall())
+    return row_count
+
+
+def read_test_db_hash(connection, settings_dict):
+    """
+    Return hash stored in the test database defined with settings_dict or None if the database doesn't exist or its
+    data were changed.
+    """
+    if connection.vendor == "sqlite" and (
+        connection.creation.is_in_memory_db(settings_dict["NAME"])
+        or not os.path.exists(settings_dict["NAME"])
+    ):
+        return None
+
+    test_db_connection = connection.copy()
+    test_db_connection.settings_dict.update(settings_dict)
+    try:
+        if TEST_DB_STATE_TABLE not in test_db_connection.introspection.table_names():
+            return None
+        with test_db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT hash, row_count FROM {}".format(
+                    test_db_connection.ops.quote_name(TEST_DB_STATE_TABLE)
+                )
+            )
+            row = cursor.fetchone()
+            if row is None or row[1] != _count_rows(test_db_connection, cursor):
+                return None
+            return row[0]
+    except DatabaseError:
+        return None
+    finally:
+        test_db_connection.close()
+
+
+def write_test_db_hash(connection, test_db_hash):
+    table_name = connection.ops.quote_name(TEST_DB_STATE_TABLE)
+    with connection.cursor() as cursor:
+        if TEST_DB_STATE_TABLE not in connection.introspection.table_names(cursor):
+            cursor.execute(
+                "CREATE TABLE {} (hash varchar(64) NOT NULL, row_count bigint NOT NULL)".format(
+                    table_name
+                )
+            )
+        cursor.execute("DELETE FROM {}".format(table_name))
+        cursor.execute(
+            "INSERT INTO {} (hash, row_count) VALUES (%s, %s)".format(table_name),
+            [test_db_hash, _count_rows(connection, cursor)],
+        )
+
+
+def can_clone_test_db_concurrently(connection):
+    """
+    In-memory SQLite databases are cloned through the main connection object, therefore they cannot be cloned
+    from several threads.
+    """
+    if connection.vendor == "sqlite":
+        return not connection.creation.is_in_memory_db(connection.settings_dict["NAME"])
+    return True
+
+
+def _can_keep_test_db_clone(connection, suffix, keepdb, test_db_hash):
+    if not keepdb or test_db_hash is None:
+        return keepdb
+    return (
+        read_test_db_hash(
+            connection, connection.creation.get_test_db_clone_settings(suffix)
+        )
+        == test_db_hash
+    )
+
+
+def _clone_test_db(connection, suffix, verbosity, keepdb):
+    # Django connections cannot be shared between threads, every clone uses its own copy of the connection
+    connection_copy = connection.copy()
+    try:
+        connection_copy.creation.clone_test_db(
+            suffix=suffix,
+            verbosity=verbosity,
+            keepdb=keepdb,
+        )
+    finally:
+        connection_copy.close()
+
+
+def clone_test_db(connection, parallel, verbosity, keepdb=False, test_db_hash=None):
+    """
+    Clone the fully migrated test database with loaded fixtures for all parallel workers. If setting
+    GERMANIUM_PARALLEL_DB_CLONING is turned on, clones are created at the same time with the backend native copy
+    (PostgreSQL template database, SQLite file copy). Kept clones are rebuilt if their hash is not equal to
+    test_db_hash.
+    """
+    suffixes = {
+        suffix: _can_keep_test_db_clone(connection, suffix, keepdb, test_db_hash)
+        for suffix in (str(index + 1) for index in range(parallel))
+    }
+    if PARALLEL_DB_CLONING and can_clone_test_db_concurrently(connection):
+        # The template database cannot be accessed by other connections during cloning
+        connection.close()
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = [
+                executor.submit(
+                    _clone_test_db, connection, suffix, verbosity, keep_clone
+                )
+                for suffix, keep_clone in suffixes.items()
+            ]
+        for future in futures:
+            future.result()
+    else:
+        for suffix, keep_clone in suffixes.items():
+            connection.creation.clone_test_db(
+                suffix=suffix,
+                verbosity=verbosity,
+                keepdb=keep_clone,
+            )
+
+
+def setup_worker_connection(connection, worker_id):
+    """
+    Switch the connection in the forked worker process to the test database clone of the worker.
+    """
+    if hasattr(connection.creation, "setup_worker_connection"):
+        connection.creation.setup_worker_connection(worker_id)
+    else:
+        connection.settings_dict.update(
+            connection.creation.get_test_db_clone_settings(str(worker_id))
+        )
+        connection.close()
 
 
 def setup_databases(
@@ -11,9 +208,13 @@ def setup_databases(
     debug_sql=False,
     parallel=0,
     aliases=None,
+    time_keeper=None,
     **kwargs
 ):
     """Create the test databases."""
+    if time_keeper is None:
+        time_keeper = NullTimeKeeper()
+
     test_databases, mirrored_aliases = get_unique_databases_and_mirrors(aliases)
 
     old_names = []
@@ -27,29 +228,61 @@ def setup_databases(
             # Actually create the database for the first connection
             if first_alias is None:
                 first_alias = alias
-                connection.creation.create_test_db(
-                    verbosity=verbosity,
-                    autoclobber=not interactive,
-                    keepdb=keepdb,
-                    serialize=connection.settings_dict["TEST"].get("SERIALIZE", True),
-                )
-
                 test_fixtures = getattr(settings, "GERMANIUM_GLOBAL_FIXTURES", {}).get(
                     alias, None
                 )
-                if test_fixtures:
-                    call_command(
-                        "loaddata",
-                        *test_fixtures,
-                        **{"verbosity": 0, "database": alias}
+
+                test_db_hash = None
+                keep_test_db = keepdb
+                if keepdb and CHECK_TEST_DB_HASH:
+                    test_db_hash = get_test_db_hash(test_fixtures, alias)
+                    keep_test_db = (
+                        read_test_db_hash(
+                            connection,
+                            {
+                                **connection.settings_dict,
+                                "NAME": connection.creation._get_test_db_name(),
+                            },
+                        )
+                        == test_db_hash
                     )
+                    if not keep_test_db and verbosity >= 1:
+                        connection.creation.log(
+                            "Test database for alias '%s' does not exist or is outdated..."
+                            % alias
+                        )
+
+                with time_keeper.timed("  Creating '%s'" % alias):
+                    connection.creation.create_test_db(
+                        verbosity=verbosity,
+                        autoclobber=not interactive or keepdb and not keep_test_db,
+                        keepdb=keep_test_db,
+                        serialize=connection.settings_dict["TEST"].get(
+                            "SERIALIZE", True
+                        ),
+                    )
+
+                # Fixtures are already loaded in the kept test database with the same hash
+                if test_fixtures and not (keep_test_db and test_db_hash):
+                    with time_keeper.timed("  Loading fixtures to '%s'" % alias):
+                        if BULK_GLOBAL_FIXTURES:
+                            load_fixtures(
+                                alias, test_fixtures, batch_size=FIXTURES_BATCH_SIZE
+                            )
+                        else:
+                            call_command(
+                                "loaddata",
+                                *test_fixtures,
+                                **{"verbosity": 0, "database": alias}
+                            )
+
+                if test_db_hash and not keep_test_db:
+                    write_test_db_hash(connection, test_db_hash)
 
                 if parallel > 1:
-                    for index in range(parallel):
-                        connection.creation.clone_test_db(
-                            suffix=str(index + 1),
-                            verbosity=verbosity,
-                            keepdb=keepdb,
+                    with time_keeper.timed("  Cloning '%s'" % alias):
+                        clone_test_db(
+                            connection, parallel, verbosity, keepdb, test_db_hash
                         )
             # Configure all other connections as mirrors of the first one
             else:
@@ -0,0 +1,591 @@
+import cProfile
+import csv
+import json
+import os
+import pstats
+import re
+import signal
+import sys
+import time
+
+from collections import Counter, defaultdict
+
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from germanium.signals import (
+    post_set_up,
+    post_set_up_class,
+    post_tear_down,
+    post_tear_down_class,
+    set_up,
+    set_up_class,
+    tear_down,
+    tear_down_class,
+)
+
+TIMINGS_FIELDS = (
+    "class",
+    "test",
+    "phase",
+    "wall_time",
+    "cpu_time",
+    "queries",
+    "query_time",
+)
+
+
+def get_class_label(test_case_class):
+    return "{}.{}".format(test_case_class.__module__, test_case_class.__qualname__)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper which counts number and duration of all executed queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+    def install(self):
+        for connection in connections.all():
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class Mark:
+
+    def __init__(self, query_counter):
+        self.wall_time = time.perf_counter()
+        self.cpu_time = time.process_time()
+        self.queries = query_counter.count
+        self.query_time = query_counter.duration
+
+
+class TestTimings:
+    """
+    Records wall time, CPU time, number of queries and query time of test phases (set_up_class, set_up, body,
+    tear_down and tear_down_class). Phases are delimited by Germanium signals. Phase set_up starts when the previous
+    test is finished, therefore all set_up signal receivers (for example in-memory storage fixtures) are measured
+    in the set_up phase.
+    """
+
+    signal_receivers = (
+        (set_up_class, "_set_up_class"),
+        (post_set_up_class, "_post_set_up_class"),
+        (set_up, "_set_up"),
+        (post_set_up, "_post_set_up"),
+        (tear_down, "_tear_down"),
+        (post_tear_down, "_post_tear_down"),
+        (tear_down_class, "_tear_down_class"),
+        (post_tear_down_class, "_post_tear_down_class"),
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self.query_counter = QueryCounter()
+        self._mark = None
+        self._next_signal = None
+
+    def enable(self):
+        if not self.enabled:
+            for sig, receiver_name in self.signal_receivers:
+                sig.connect(
+                    getattr(self, receiver_name),
+                    dispatch_uid="germanium_test_timings{}".format(receiver_name),
+                )
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            for sig, receiver_name in self.signal_receivers:
+                sig.disconnect(
+                    dispatch_uid="germanium_test_timings{}".format(receiver_name)
+                )
+            self.query_counter.uninstall()
+            self.enabled = False
+
+    def pop_records(self):
+        records, self.records = self.records, []
+        return records
+
+    def add_records(self, records):
+        self.records.extend(records)
+
+    def _start(self, next_signal):
+        self.query_counter.install()
+        self._mark = Mark(self.query_counter)
+        self._next_signal = next_signal
+
+    def _record(self, sender, phase, test=None, next_signal=None):
+        mark = Mark(self.query_counter)
+        self.records.append(
+            {
+                "class": get_class_label(sender),
+                "test": test.id() if test is not None else None,
+                "phase": phase,
+                "wall_time": mark.wall_time - self._mark.wall_time,
+                "cpu_time": mark.cpu_time - self._mark.cpu_time,
+                "queries": mark.queries - self._mark.queries,
+                "query_time": mark.query_time - self._mark.query_time,
+            }
+        )
+        self._mark = mark
+        self._next_signal = next_signal
+
+    def _set_up_class(self, sender, **kwargs):
+        self._start("post_set_up_class")
+
+    def _post_set_up_class(self, sender, **kwargs):
+        if self._next_signal == "post_set_up_class":
+            self._record(sender, "set_up_class", next_signal="set_up")
+
+    def _set_up(self, sender, **kwargs):
+        if self._next_signal != "set_up":
+            # The previous test was not finished (for example set_up failed)
+            self._start("post_set_up")
+        self._next_signal = "post_set_up"
+
+    def _post_set_up(self, sender, test=None, **kwargs):
+        if self._next_signal == "post_set_up":
+            self._record(sender, "set_up", test, next_signal="tear_down")
+
+    def _tear_down(self, sender, test=None, **kwargs):
+        if self._next_signal == "tear_down":
+            self._record(sender, "body", test, next_signal="post_tear_down")
+        else:
+            self._start("post_tear_down")
+
+    def _post_tear_down(self, sender, test=None, **kwargs):
+        if self._next_signal == "post_tear_down":
+            self._record(sender, "tear_down", test, next_signal="set_up")
+
+    def _tear_down_class(self, sender, **kwargs):
+        self._start("post_tear_down_class")
+
+    def _post_tear_down_class(self, sender, **kwargs):
+        if self._next_signal == "post_tear_down_class":
+            self._record(sender, "tear_down_class")
+
+    def write_report(self, path):
+        """
+        Write records to the CSV file (path with .csv extension) or JSON file.
+        """
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=TIMINGS_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records)
+            else:
+                json.dump(self.records, f, indent=2)
+
+    def _get_slowest(self, key, count):
+        totals = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            if record[key] is not None:
+                total = totals[record[key]]
+                total["wall_time"] += record["wall_time"]
+                total[record["phase"]] += record["wall_time"]
+                total["queries"] += record["queries"]
+        return sorted(
+            totals.items(), key=lambda item: item[1]["wall_time"], reverse=True
+        )[:count]
+
+    def print_slowest(self, count, stream=None):
+        stream = stream or sys.stderr
+        for key, title, phases in (
+            ("test", "tests", ("set_up", "body", "tear_down")),
+            ("class", "test cases", ("set_up_class", "tear_down_class")),
+        ):
+            slowest = self._get_slowest(key, count)
+            if not slowest:
+                continue
+            stream.write("\nSlowest {} {}:\n".format(len(slowest), title))
+            for label, total in slowest:
+                stream.write(
+                    "{:.3f}s {} ({}, {:.0f} queries)\n".format(
+                        total["wall_time"],
+                        label,
+                        ", ".join(
+                            "{} {:.3f}s".format(phase, total[phase]) for phase in phases
+                        ),
+                        total["queries"],
+                    )
+                )
+
+
+test_timings = TestTimings()
+
+
+class RawStats:
+    """
+    Wrapper of the raw profile stats dictionary which can be loaded with pstats.Stats.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StackSampler:
+    """
+    Sampling profiler which collects stacks of the main thread with SIGPROF signal in the collapsed stack format.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous_handler = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def pop_collapsed_stacks(self):
+        collapsed_stacks = Counter()
+        for stack, count in self.stacks.items():
+            collapsed_stacks[
+                ";".join(
+                    "{} ({}:{})".format(
+                        code.co_name, code.co_filename, code.co_firstlineno
+                    )
+                    for code in stack
+                )
+            ] += count
+        self.stacks = Counter()
+        return collapsed_stacks
+
+
+class TestProfiler:
+    """
+    Profiles body of the tests marked with the profile_test decorator (or all tests) and merges results of all
+    tests. Output format pstats uses cProfile, format collapsed uses the sampling profiler and writes stacks for the
+    flame graph tools.
+    """
+
+    formats = ("pstats", "collapsed")
+
+    def __init__(self):
+        self.enabled = False
+        self.format = "pstats"
+        self.profile_all = False
+        self.stats = pstats.Stats()
+        self.collapsed_stacks = Counter()
+        self._profiler = None
+
+    def enable(self, format="pstats", profile_all=False):
+        if format not in self.formats:
+            raise ValueError("Invalid profile format {}".format(format))
+        self.format = format
+        self.profile_all = profile_all
+        if not self.enabled:
+            post_set_up.connect(
+                self._post_set_up, dispatch_uid="germanium_test_profiler"
+            )
+            tear_down.connect(self._tear_down, dispatch_uid="germanium_test_profiler")
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            post_set_up.disconnect(dispatch_uid="germanium_test_profiler")
+            tear_down.disconnect(dispatch_uid="germanium_test_profiler")
+            self._stop()
+            self.enabled = False
+
+    def is_profiled(self, test):
+        return (
+            self.profile_all
+            or getattr(getattr(test, test._testMethodName, None), "is_profiled", False)
+            or getattr(type(test), "is_profiled", False)
+        )
+
+    def _post_set_up(self, sender, test=None, **kwargs):
+        if test is not None and self.is_profiled(test):
+            if self.format == "pstats":
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            else:
+                self._profiler = StackSampler()
+                self._profiler.start()
+
+    def _tear_down(self, sender, **kwargs):
+        self._stop()
+
+    def _stop(self):
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return
+        if self.format == "pstats":
+            profiler.disable()
+            self.stats.add(profiler)
+        else:
+            profiler.stop()
+            self.collapsed_stacks.update(profiler.pop_collapsed_stacks())
+
+    def pop_data(self):
+        """
+        Return collected data or None if no test was profiled.
+        """
+        if self.format == "pstats":
+            data, self.stats = self.stats.stats, pstats.Stats()
+        else:
+            data, self.collapsed_stacks = dict(self.collapsed_stacks), Counter()
+        return data or None
+
+    def add_data(self, data):
+        if not data:
+            # pstats.Stats cannot be created from empty stats
+            return
+        if self.format == "pstats":
+            self.stats.add(RawStats(data))
+        else:
+            self.collapsed_stacks.update(data)
+
+    def write(self, path):
+        if self.format == "pstats":
+            self.stats.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                for stack, count in self.collapsed_stacks.most_common():
+                    f.write("{} {}\n".format(stack, count))
+
+
+test_profiler = TestProfiler()
+
+
+class NPlusOneDetector:
+    """
+    Captures queries of the test bodies and finds SELECT queries with the same SQL fingerprint and call site executed
+    more than threshold times inside one request of the test client (or inside the test body outside requests). Offenders
+    from the baseline file (the report of the previous run) are allowed if their count did not grow.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 5
+        self.findings = []
+        self._query_recorder = None
+        self._test = None
+        self._request_start = None
+
+    def enable(self, threshold=5):
+        from germanium.tools.models import QueryRecorder
+
+        self.threshold = threshold
+        self._query_recorder = QueryRecorder()
+        if not self.enabled:
+            post_set_up.connect(
+                self._post_set_up, dispatch_uid="germanium_n_plus_one_detector"
+            )
+            tear_down.connect(
+                self._tear_down, dispatch_uid="germanium_n_plus_one_detector"
+            )
+            request_started.connect(
+                self._request_started, dispatch_uid="germanium_n_plus_one_detector"
+            )
+            request_finished.connect(
+                self._request_finished, dispatch_uid="germanium_n_plus_one_detector"
+            )
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            for sig in (post_set_up, tear_down, request_started, request_finished):
+                sig.disconnect(dispatch_uid="germanium_n_plus_one_detector")
+            self._stop()
+            self.enabled = False
+
+    def _post_set_up(self, sender, test=None, **kwargs):
+        if test is not None:
+            self._stop()
+            self._test = test.id()
+            for connection in connections.all():
+                connection.execute_wrappers.append(self._query_recorder)
+
+    def _tear_down(self, sender, **kwargs):
+        self._stop()
+
+    def _stop(self):
+        if self._test is None:
+            return
+        for connection in connections.all():
+            if self._query_recorder in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self._query_recorder)
+        self._analyze(self._query_recorder.queries)
+        self._query_recorder.queries = []
+        self._test = None
+        self._request_start = None
+
+    def _request_started(self, sender, environ=None, **kwargs):
+        if self._test is not None:
+            self._request_start = (
+                len(self._query_recorder.queries),
+                (environ or {}).get("PATH_INFO"),
+            )
+
+    def _request_finished(self, sender, **kwargs):
+        if self._test is not None and self._request_start is not None:
+            start, path = self._request_start
+            self._request_start = None
+            queries = self._query_recorder.queries
+            self._analyze(queries[start:], path)
+            del queries[start:]
+
+    def _analyze(self, queries, request=None):
+        queries_by_key = defaultdict(list)
+        for query in queries:
+            # Repeated inserts and updates usually create test data
+            if query.fingerprint[:6].upper() == "SELECT":
+                queries_by_key[query.fingerprint, query.call_site].append(query)
+        for (fingerprint, call_site), key_queries in queries_by_key.items():
+            if len(key_queries) > self.threshold:
+                self.findings.append(
+                    {
+                        "fingerprint": fingerprint,
+                        "call_site": get_relative_call_site(call_site),
+                        "count": len(key_queries),
+                        "duration": sum(query.duration for query in key_queries),
+                        "test": self._test,
+                        "request": request,
+                    }
+                )
+
+    def pop_findings(self):
+        findings, self.findings = self.findings, []
+        return findings
+
+    def add_findings(self, findings):
+        self.findings.extend(findings)
+
+    def get_offenders(self):
+        """
+        Return findings grouped by fingerprint and call site ordered by the maximal count of queries.
+        """
+        offenders = {}
+        for finding in self.findings:
+            key = (finding["fingerprint"], finding["call_site"])
+            offender = offenders.setdefault(
+                key,
+                {
+                    "fingerprint": finding["fingerprint"],
+                    "call_site": finding["call_site"],
+                    "max_count": 0,
+                    "total_count": 0,
+                    "occurrences": 0,
+                    "duration": 0.0,
+                    "tests": [],
+                },
+            )
+            offender["max_count"] = max(offender["max_count"], finding["count"])
+            offender["total_count"] += finding["count"]
+            offender["occurrences"] += 1
+            offender["duration"] += finding["duration"]
+            if finding["test"] not in offender["tests"]:
+                offender["tests"].append(finding["test"])
+        return sorted(
+            offenders.values(),
+            key=lambda offender: (-offender["max_count"], -offender["duration"]),
+        )
+
+    def get_new_offenders(self, baseline_path=None):
+        """
+        Return offenders which are not in the baseline file or their maximal count of queries grew.
+        """
+        offenders = self.get_offenders()
+        if not baseline_path or not os.path.exists(baseline_path):
+            return offenders
+
+        with open(baseline_path) as f:
+            baseline = {
+                (
+                    offender["fingerprint"],
+                    get_baseline_call_site(offender["call_site"]),
+                ): (offender["max_count"])
+                for offender in json.load(f)
+            }
+        return [
+            offender
+            for offender in offenders
+            if offender["max_count"]
+            > baseline.get(
+                (
+                    offender["fingerprint"],
+                    get_baseline_call_site(offender["call_site"]),
+                ),
+                0,
+            )
+        ]
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.get_offenders(), f, indent=2)
+
+    def print_offenders(self, offenders, stream=None, limit=10, fail=False):
+        stream = stream or sys.stderr
+        if not offenders:
+            return
+        stream.write("\nN+1 queries ({} new offenders):\n".format(len(offenders)))
+        for offender in offenders[:limit]:
+            stream.write(
+                "{}x {} ({})\n    {}\n".format(
+                    offender["max_count"],
+                    offender["call_site"],
+                    offender["tests"][0],
+                    offender["fingerprint"],
+                )
+            )
+        if fail:
+            stream.write(
+                "The test run fails because of {} new N+1 query offenders "
+                "(--germanium-n-plus-one-fail).\n".format(len(offenders))
+            )
+
+
+def get_relative_call_site(call_site):
+    if call_site is None:
+        return None
+    path = call_site.split(":", 1)[0]
+    if os.path.isabs(path) and path.startswith(os.getcwd() + os.sep):
+        return os.path.relpath(path) + call_site[len(path) :]
+    return call_site
+
+
+CALL_SITE_LINE_RE = re.compile(r":\d+ in ")
+
+
+def get_baseline_call_site(call_site):
+    """
+    Call site without the line number, therefore the baseline is not broken by the changes of the file.
+    """
+    return CALL_SITE_LINE_RE.sub(" in ", call_site) if call_site else call_site
+
+
+n_plus_one_detector = NPlusOneDetector()
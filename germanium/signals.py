@@ -1,6 +1,10 @@
 from django.dispatch import Signal
 
 set_up_class = Signal()
+post_set_up_class = Signal()
 tear_down_class = Signal()
+post_tear_down_class = Signal()
 set_up = Signal()
+post_set_up = Signal()
 tear_down = Signal()
+post_tear_down = Signal()
@@ -1,6 +1,6 @@
 import os
 
-from io import StringIO, BytesIO
+from io import BytesIO, TextIOWrapper
 from urllib.parse import urljoin
 
 from django.conf import settings
@@ -33,10 +33,20 @@ class InMemoryNode:
         child.parent = self
         self.children[name] = child
 
+    def get_child(self, name):
+        return self.children.get(name)
+
+    def remove_child(self, name):
+        del self.children[name]
+
+    def child_items(self):
+        return list(self.children.items())
+
 
 class InMemoryFile(InMemoryNode, File):
     """
-    Stores contents of file and stores reference to parent. File interface is identical
+    Stores contents of file as bytes and stores reference to parent. Text mode is a lazy UTF-8 wrapper over the
+    bytes, therefore the content is never converted when the mode is changed. File interface is identical
     to ContentFile, except that self.size works even after data has been written to it
     """
 
@@ -47,8 +57,8 @@ class InMemoryFile(InMemoryNode, File):
         self.last_modified = timezone.now()
         self.last_accessed = timezone.now()
 
-        stream_class = StringIO if isinstance(content, str) else BytesIO
-        File.__init__(self, stream_class(content), name=name)
+        self.content = BytesIO(force_bytes(content))
+        File.__init__(self, self._get_stream(isinstance(content, str)), name=name)
 
     def __str__(self):
         return "<InMemoryFile: %s>" % self.name
@@ -59,28 +69,83 @@ class InMemoryFile(InMemoryNode, File):
     def __nonzero__(self):  # Python 2 compatibility
         return type(self).__bool__(self)
 
+    def _get_stream(self, text):
+        if text:
+            return TextIOWrapper(self.content, encoding="utf-8", newline="")
+        else:
+            return self.content
+
+    def _flush(self):
+        if self.file is not self.content:
+            self.file.flush()
+
     @property
-    def _size(self):
-        pos = self.file.tell()
-        self.file.seek(0, os.SEEK_END)
-        size = self.file.tell()
-        self.file.seek(pos)
+    def size(self):
+        self._flush()
+        pos = self.content.tell()
+        size = self.content.seek(0, os.SEEK_END)
+        self.content.seek(pos)
         return size
 
     def open(self, mode=None):
-        self.seek(0)
-        if "b" in mode:
-            if not isinstance(self.file, BytesIO):
-                self.file = BytesIO(self.file.getvalue().encode("utf-8"))
-        else:
-            if not isinstance(self.file, StringIO):
-                self.file = StringIO(self.file.getvalue().decode("utf-8"))
+        mode = mode or "rb"
+        if self.file is not self.content:
+            # Text wrapper would close the bytes stream
+            self.file.detach()
+        if "w" in mode:
+            self.content = BytesIO()
+        self.content.seek(0)
+        self.file = self._get_stream("b" not in mode)
 
     def close(self):
         pass
 
+    def copy(self):
+        """
+        Return a new file with the same content. Content of BytesIO is not copied until it is changed.
+        """
+        self._flush()
+        file = InMemoryFile(content=self.content.getvalue(), name=self.name)
+        file.created_at = self.created_at
+        file.last_modified = self.last_modified
+        file.last_accessed = self.last_accessed
+        return file
+
 
-class InMemoryDir(InMemoryNode):
+class InMemoryFilesystemMixin:
+    """
+    File operations of the in-memory filesystem which are implemented with the filesystem method resolve.
+    """
+
+    def exists(self, name):
+        try:
+            self.resolve(name)
+        except PathDoesNotExist:
+            return False
+        else:
+            return True
+
+    def size(self, name):
+        return self.resolve(name).size
+
+    def open(self, path, mode="r"):
+        create = "w" in mode
+        use_bytes = "b" in mode
+        f = self.resolve(path, create=create, use_bytes=use_bytes)
+        f.open(mode)
+        f.last_accessed = timezone.now()
+        return f
+
+    def save(self, path, content):
+        chunks = (content,) if isinstance(content, (bytes, str)) else content.chunks()
+        with self.open(path, "wb") as f:
+            for chunk in chunks:
+                f.write(force_bytes(chunk))
+        f.last_modified = timezone.now()
+        return path
+
+
+class InMemoryDir(InMemoryFilesystemMixin, InMemoryNode):
     """
     Stores dictionary of child directories/files and reference to parent.
     """
@@ -89,6 +154,12 @@ class InMemoryDir(InMemoryNode):
         self.children = {}
         self.parent = parent
 
+    def fork(self):
+        """
+        Return copy-on-write layer over the directory.
+        """
+        return InMemoryOverlayDir(base=self)
+
     def resolve(self, path, create=False, use_bytes=False):
         path = os.path.normpath(path)
         path_bits = path.strip(os.sep).split(os.sep, 1)
@@ -97,68 +168,209 @@ class InMemoryDir(InMemoryNode):
         if not rest:
             if current == "." or current == "":
                 return self
-            if current in self.children.keys():
-                return self.children[current]
+            child = self.get_child(current)
+            if child is not None:
+                return child
             if not create:
                 raise PathDoesNotExist(path)
             content = b"" if use_bytes else ""
             node = InMemoryFile(name=current, content=content)
             self.add_child(current, node)
             return node
-        if current in self.children.keys():
-            return self.children[current].resolve(
-                rest, create=create, use_bytes=use_bytes
-            )
+        child = self.get_child(current)
+        if child is not None:
+            return child.resolve(rest, create=create, use_bytes=use_bytes)
         if not create:
             raise PathDoesNotExist(path)
         node = InMemoryDir()
         self.add_child(current, node)
-        return self.children[current].resolve(rest, create=create, use_bytes=use_bytes)
+        return node.resolve(rest, create=create, use_bytes=use_bytes)
 
     def ls(self, path=""):
-        return list(self.resolve(path).children.keys())
+        return [name for name, _ in self.resolve(path).child_items()]
 
     def listdir(self, dir):
-        nodes = tuple(self.resolve(dir).children.items())
+        nodes = self.resolve(dir).child_items()
         dirs = [k for (k, v) in nodes if isinstance(v, InMemoryDir)]
         files = [k for (k, v) in nodes if isinstance(v, InMemoryFile)]
         return [dirs, files]
 
     def delete(self, path):
         node = self.resolve(path)
-        for name, child in node.parent.children.items():
+        for name, child in node.parent.child_items():
             if child is node:
-                del node.parent.children[name]
+                node.parent.remove_child(name)
                 break
 
-    def exists(self, name):
-        try:
-            self.resolve(name)
-        except PathDoesNotExist:
-            return False
+
+class InMemoryOverlayDir(InMemoryDir):
+    """
+    Copy-on-write layer over the shared (read-only) snapshot directory. Children of the snapshot are copied to the
+    layer only when they are accessed, directories are wrapped with a new layer and files are copied. Removed
+    children of the snapshot are remembered to hide them. The snapshot is never changed.
+    """
+
+    def __init__(self, base=None, parent=None):
+        super().__init__(parent=parent)
+        self.base = base
+        self.removed = set()
+
+    def add_child(self, name, child):
+        super().add_child(name, child)
+        self.removed.discard(name)
+
+    def get_child(self, name):
+        child = self.children.get(name)
+        if child is not None or self.base is None or name in self.removed:
+            return child
+
+        base_child = self.base.get_child(name)
+        if base_child is None:
+            return None
+        elif isinstance(base_child, InMemoryDir):
+            child = InMemoryOverlayDir(base=base_child)
         else:
-            return True
+            child = base_child.copy()
+        super().add_child(name, child)
+        return child
+
+    def remove_child(self, name):
+        self.children.pop(name, None)
+        self.removed.add(name)
+
+    def child_items(self):
+        items = list(self.children.items())
+        if self.base is not None:
+            items += [
+                (name, child)
+                for name, child in self.base.child_items()
+                if name not in self.children and name not in self.removed
+            ]
+        return items
+
+
+class InMemoryFlatDirNode:
+    """
+    Directory of the flat filesystem. Children are stored in the directory index of the filesystem.
+    """
 
-    def size(self, name):
-        return self.resolve(name).size
+    def __init__(self, path):
+        self.path = path
 
-    def open(self, path, mode="r"):
-        create = "w" in mode
-        use_bytes = "b" in mode
-        f = self.resolve(path, create=create, use_bytes=use_bytes)
-        f.open(mode)
-        f.last_accessed = timezone.now()
-        return f
 
-    def save(self, path, content):
-        mode = "wb" if isinstance(content, bytes) else "w"
-        with self.open(path, mode) as f:
-            f.write(content)
-        f.last_modified = timezone.now()
+class FlatInMemoryDir(InMemoryFilesystemMixin):
+    """
+    In-memory filesystem which stores all nodes in a flat dictionary indexed by the normalized path and names of
+    the children in a per-directory index. Lookup, exists, open and delete don't depend on the depth of the path or
+    on the size of the directory.
+
+    Filesystem with the base is a copy-on-write layer over the base filesystem. Files of the base are copied when
+    they are resolved, removed paths of the base are hidden with tombstones. The base is never changed.
+    """
+
+    def __init__(self, base=None):
+        self.base = base
+        self.nodes = {"": InMemoryFlatDirNode("")}
+        self.children = {}
+        self.removed = set()
+
+    @staticmethod
+    def normalize_path(path):
+        path = os.path.normpath(path).strip(os.sep)
+        return "" if path == "." else path
+
+    def fork(self):
+        return FlatInMemoryDir(base=self)
+
+    def _get_node(self, path):
+        node = self.nodes.get(path)
+        if node is None and self.base is not None and path not in self.removed:
+            node = self.base._get_node(path)
+        return node
+
+    def _add_node(self, path, node):
+        parent_path, name = os.path.split(path)
+        parent = self._get_node(parent_path)
+        if parent is None:
+            self._add_node(parent_path, InMemoryFlatDirNode(parent_path))
+        elif not isinstance(parent, InMemoryFlatDirNode):
+            raise PathDoesNotExist(path)
+        self.nodes[path] = node
+        self.removed.discard(path)
+        self.children.setdefault(parent_path, {})[name] = None
+        return node
+
+    def _get_child_names(self, path):
+        names = {}
+        if self.base is not None:
+            names.update(
+                (name, None)
+                for name in self.base._get_child_names(path)
+                if os.path.join(path, name) not in self.removed
+            )
+        names.update(self.children.get(path, {}))
+        return list(names)
+
+    def _resolve_dir(self, path):
+        path = self.normalize_path(path)
+        if not isinstance(self.resolve(path), InMemoryFlatDirNode):
+            raise PathDoesNotExist(path)
         return path
 
+    def resolve(self, path, create=False, use_bytes=False):
+        path = self.normalize_path(path)
+        node = self._get_node(path)
+        if node is None:
+            if not create:
+                raise PathDoesNotExist(path)
+            content = b"" if use_bytes else ""
+            node = self._add_node(
+                path, InMemoryFile(name=os.path.basename(path), content=content)
+            )
+        elif isinstance(node, InMemoryFile) and path not in self.nodes:
+            # File of the base filesystem must not be changed
+            node = self.nodes[path] = node.copy()
+        return node
+
+    def exists(self, name):
+        return self._get_node(self.normalize_path(name)) is not None
+
+    def ls(self, path=""):
+        return self._get_child_names(self._resolve_dir(path))
+
+    def listdir(self, dir):
+        path = self._resolve_dir(dir)
+        dirs, files = [], []
+        for name in self._get_child_names(path):
+            if isinstance(
+                self._get_node(os.path.join(path, name)), InMemoryFlatDirNode
+            ):
+                dirs.append(name)
+            else:
+                files.append(name)
+        return [dirs, files]
 
-test_filesystems = defaultdict(lambda: defaultdict(InMemoryDir))
+    def delete(self, path):
+        path = self.normalize_path(path)
+        node = self._get_node(path)
+        if node is None:
+            raise PathDoesNotExist(path)
+        if not path:
+            raise ValueError("Root directory cannot be deleted")
+
+        if isinstance(node, InMemoryFlatDirNode):
+            for name in self._get_child_names(path):
+                self.delete(os.path.join(path, name))
+            self.children.pop(path, None)
+        self.nodes.pop(path, None)
+        parent_path, name = os.path.split(path)
+        self.children.get(parent_path, {}).pop(name, None)
+        if self.base is not None and self.base._get_node(path) is not None:
+            self.removed.add(path)
+
+
+test_filesystems = defaultdict(dict)
+test_filesystem_snapshots = {}
 test_storages = []
 
 
@@ -169,6 +381,7 @@ class TestInMemoryStorage(Storage):
     """
 
     filesystem_name = "default"
+    filesystem_class = InMemoryDir
 
     def __init__(self, base_url=None):
         if base_url is None:
@@ -178,7 +391,10 @@ class TestInMemoryStorage(Storage):
 
     @property
     def filesystem(self):
-        return test_filesystems[os.getpid()][self.filesystem_name]
+        filesystems = test_filesystems[os.getpid()]
+        if self.filesystem_name not in filesystems:
+            filesystems[self.filesystem_name] = self.filesystem_class()
+        return filesystems[self.filesystem_name]
 
     def listdir(self, dir):
         return self.filesystem.listdir(dir)
@@ -196,7 +412,7 @@ class TestInMemoryStorage(Storage):
         return self.filesystem.open(name, mode)
 
     def _save(self, name, content):
-        return self.filesystem.save(name, content.read())
+        return self.filesystem.save(name, content)
 
     def url(self, name):
         if self.base_url is None:
@@ -218,17 +434,41 @@ class TestInMemoryStorage(Storage):
     def __eq__(self, other):
         return self.filesystem == other.filesystem and self.base_url == other.base_url
 
+    def get_fixtures_snapshot(self):
+        """
+        Returns the filesystem with the fixtures. Fixtures are read from the disk only once per process.
+        """
+        if self.filesystem_name not in test_filesystem_snapshots:
+            snapshot = self.filesystem_class()
+            for fixture_dir in settings.FIXTURE_DIRS:
+                fixture_dir = os.path.join(fixture_dir, self.filesystem_name)
+                for root, dirs, files in os.walk(fixture_dir):
+                    for file in files:
+                        full_file_path = os.path.join(root, file)
+                        with open(full_file_path, "rb") as f:
+                            snapshot.save(
+                                os.path.relpath(full_file_path, fixture_dir), File(f)
+                            )
+            test_filesystem_snapshots[self.filesystem_name] = snapshot
+        return test_filesystem_snapshots[self.filesystem_name]
+
     def load_fixtures(self):
         """
-        Loads fixtures into the filesystem.
+        Loads fixtures into the filesystem. The filesystem is a copy-on-write layer over the fixtures snapshot,
+        therefore the test changes are dropped with the filesystem.
         """
-        for fixture_dir in settings.FIXTURE_DIRS:
-            fixture_dir = os.path.join(fixture_dir, self.filesystem_name)
-            for root, dirs, files in os.walk(fixture_dir):
-                for file in files:
-                    full_file_path = os.path.join(root, file)
-                    with open(full_file_path, "rb") as f:
-                        self.save(os.path.relpath(full_file_path, fixture_dir), f)
+        test_filesystems[os.getpid()][
+            self.filesystem_name
+        ] = self.get_fixtures_snapshot().fork()
+
+
+@deconstructible
+class TestFlatInMemoryStorage(TestInMemoryStorage):
+    """
+    Django storage class for in-memory filesystem with flat path index, suitable for directories with many files.
+    """
+
+    filesystem_class = FlatInMemoryDir
 
 
 def clean_test_filesystem(sender, **kwargs):
@@ -3,8 +3,22 @@ import types
 from django.conf import settings
 from django.test.testcases import TestCase, SimpleTestCase
 
-from germanium.signals import set_up, set_up_class, tear_down, tear_down_class
-from germanium.config import TEST_ALL_DATABASES
+from germanium.signals import (
+    post_set_up,
+    post_set_up_class,
+    post_tear_down,
+    post_tear_down_class,
+    set_up,
+    set_up_class,
+    tear_down,
+    tear_down_class,
+)
+from germanium.config import (
+    FIXTURES_BATCH_SIZE,
+    SNAPSHOT_FIXTURES,
+    TEST_ALL_DATABASES,
+)
+from germanium.django.fixtures import load_fixtures
 
 
 class GermaniumSimpleTestCaseMixin:
@@ -17,6 +31,7 @@ class GermaniumSimpleTestCaseMixin:
         set_up_class.send(sender=cls)
         super().setUpClass()
         cls.set_up_class()
+        post_set_up_class.send(sender=cls)
 
     @classmethod
     def set_up_class(cls):
@@ -27,23 +42,26 @@ class GermaniumSimpleTestCaseMixin:
         tear_down_class.send(sender=cls)
         super().tearDownClass()
         cls.tear_down_class()
+        post_tear_down_class.send(sender=cls)
 
     @classmethod
     def tear_down_class(cls):
         pass
 
     def setUp(self):
-        set_up.send(sender=self.__class__)
+        set_up.send(sender=self.__class__, test=self)
         super().setUp()
         self.set_up()
+        post_set_up.send(sender=self.__class__, test=self)
 
     def set_up(self):
         pass
 
     def tearDown(self):
-        tear_down.send(sender=self.__class__)
+        tear_down.send(sender=self.__class__, test=self)
         super().tearDown()
         self.tear_down()
+        post_tear_down.send(sender=self.__class__, test=self)
 
     def tear_down(self):
         pass
@@ -54,6 +72,48 @@ class GermaniumTestCaseMixin(GermaniumSimpleTestCaseMixin):
     if getattr(settings, "GERMANIUM_FIXTURES", None):
         fixtures = getattr(settings, "GERMANIUM_FIXTURES", None)
 
+    @classmethod
+    def setUpClass(cls):
+        if not (
+            SNAPSHOT_FIXTURES
+            and cls.fixtures
+            and issubclass(cls, TestCase)
+            and cls._databases_support_transactions()
+        ):
+            super().setUpClass()
+            return
+
+        # Fixtures are hidden to the Django loaddata and loaded from the snapshot in the _enter_atomics method
+        cls._snapshot_fixtures = cls.fixtures
+        class_fixtures = cls.__dict__.get("fixtures")
+        cls.fixtures = None
+        try:
+            super().setUpClass()
+        finally:
+            if class_fixtures is None:
+                del cls.fixtures
+            else:
+                cls.fixtures = class_fixtures
+            del cls._snapshot_fixtures
+
+    @classmethod
+    def _enter_atomics(cls):
+        atomics = super()._enter_atomics()
+        snapshot_fixtures = cls.__dict__.get("_snapshot_fixtures")
+        if snapshot_fixtures:
+            for db_name in cls._databases_names(include_mirrors=False):
+                try:
+                    load_fixtures(
+                        db_name,
+                        snapshot_fixtures,
+                        batch_size=FIXTURES_BATCH_SIZE,
+                        snapshot=True,
+                    )
+                except Exception:
+                    cls._rollback_atomics(atomics)
+                    raise
+        return atomics
+
 
 class GermaniumTestCase(GermaniumTestCaseMixin, TestCase):
     pass
@@ -1,6 +1,82 @@
+from collections import defaultdict
+
+from django.db import connections, router
+from django.db.models import Model
+
 from .default import GermaniumTestCase
 
 
+def _get_unsaved_related_instances(inst):
+    for field in inst._meta.concrete_fields:
+        if field.is_relation and field.is_cached(inst):
+            related_inst = field.get_cached_value(inst)
+            if related_inst is not None and related_inst._state.adding:
+                yield related_inst
+
+
+def bulk_create_instances(insts, batch_size=None):
+    """
+    Insert unsaved instances with bulk_create (one query per model and batch). Unsaved related instances (for
+    example built by sub-factories) are inserted before the instances. Instances of models with multi-table
+    inheritance or instances of the databases which cannot return primary keys from bulk insert are saved one by
+    one. Model signals are not sent for the bulk inserted instances.
+    """
+    unsaved_insts = list(
+        {id(inst): inst for inst in insts if inst._state.adding}.values()
+    )
+    if not unsaved_insts:
+        return
+
+    bulk_create_instances(
+        [
+            related_inst
+            for inst in unsaved_insts
+            for related_inst in _get_unsaved_related_instances(inst)
+        ],
+        batch_size=batch_size,
+    )
+
+    insts_by_model = defaultdict(list)
+    for inst in unsaved_insts:
+        insts_by_model[type(inst)].append(inst)
+
+    for model, model_insts in insts_by_model.items():
+        using = router.db_for_write(model)
+        if (
+            model._meta.parents
+            or not connections[using].features.can_return_rows_from_bulk_insert
+        ):
+            for inst in model_insts:
+                inst.save(using=using)
+        else:
+            model._base_manager.using(using).bulk_create(
+                model_insts, batch_size=batch_size
+            )
+
+
+def bulk_add_m2m(insts, field_name, values, batch_size=None):
+    """
+    Add values (instances or primary keys) to the M2M relation of all instances with one bulk_create of the through
+    model. Signal m2m_changed is not sent.
+    """
+    if not insts:
+        return
+
+    field = insts[0]._meta.get_field(field_name)
+    through = field.remote_field.through
+    source_attname = through._meta.get_field(field.m2m_field_name()).attname
+    target_attname = through._meta.get_field(field.m2m_reverse_field_name()).attname
+    target_pks = [value.pk if isinstance(value, Model) else value for value in values]
+    through._base_manager.using(router.db_for_write(through)).bulk_create(
+        [
+            through(**{source_attname: inst.pk, target_attname: target_pk})
+            for inst in insts
+            for target_pk in target_pks
+        ],
+        batch_size=batch_size,
+    )
+
+
 class ModelTestCase(GermaniumTestCase):
 
     factory_class = None
@@ -18,3 +94,37 @@ class ModelTestCase(GermaniumTestCase):
         for _ in range(count):
             insts.append(self.inst_data_provider(**inst_kwargs))
         return insts
+
+    def bulk_insts_data_provider(
+        self, count=10, pks=None, batch_size=None, **inst_kwargs
+    ):
+        """
+        Batched version of insts_data_provider. Instances are built with the factory build_batch (without saving)
+        and inserted with bulk_create. Values of M2M fields from inst_kwargs are added to all instances with one
+        bulk insert of the through model. If pks are set, instances are loaded with one in_bulk query instead.
+        Factory post generation hooks are called with create=False.
+        """
+        factory_class = inst_kwargs.pop("factory_class", self.factory_class)
+        model = factory_class._meta.model
+        if pks is not None:
+            pks = [model._meta.pk.to_python(pk) for pk in pks]
+            insts_by_pk = model.objects.in_bulk(pks)
+            missing_pks = [pk for pk in pks if pk not in insts_by_pk]
+            if missing_pks:
+                raise model.DoesNotExist(
+                    "{} matching pks {} do not exist.".format(
+                        model._meta.object_name, missing_pks
+                    )
+                )
+            return [insts_by_pk[pk] for pk in pks]
+
+        m2m_values = {
+            field.name: inst_kwargs.pop(field.name)
+            for field in model._meta.many_to_many
+            if field.name in inst_kwargs
+        }
+        insts = factory_class.build_batch(count, **inst_kwargs)
+        bulk_create_instances(insts, batch_size=batch_size)
+        for field_name, values in m2m_values.items():
+            bulk_add_m2m(insts, field_name, values, batch_size=batch_size)
+        return insts
@@ -1,3 +1,5 @@
+import logging
+
 from io import StringIO
 
 from contextlib import contextmanager
@@ -5,6 +7,10 @@ from contextlib import contextmanager
 from django.core.management import call_command
 from django.db import DEFAULT_DB_ALIAS, connections
 
+ALL_DATABASES = "__all__"
+
+LOG = logging.getLogger("tests")
+
 
 class CatchCallbacks:
 
@@ -19,51 +25,110 @@ class CatchCallbacks:
     def _watching_callbacks(self):
         return getattr(self._connection, self._callback_name, [])
 
-    def _set_watching_callback(self, callbacks):
-        setattr(self._connection, self._callback_name, callbacks)
-
     def end(self):
         self._end_count = len(self._watching_callbacks)
 
+    def _get_end_count(self):
+        return (
+            len(self._watching_callbacks)
+            if self._end_count is None
+            else self._end_count
+        )
+
     def get_callbacks(self, start_count=None):
         start_count = self._start_count if start_count is None else start_count
-
-        if self._end_count == None:
-            watching_callbacks = self._watching_callbacks[start_count:]
+        # Items are tuples (savepoint ids, callback) or (savepoint ids, callback, robust) since Django 4.2
+        return [
+            self._watching_callbacks[i][1]
+            for i in range(start_count, self._get_end_count())
+        ]
+
+    def _call(self, callback_item):
+        callback = callback_item[1]
+        if len(callback_item) > 2 and callback_item[2]:
+            try:
+                callback()
+            except Exception as ex:
+                LOG.error(
+                    "Error calling %s in on_commit() (%s).",
+                    getattr(callback, "__qualname__", callback),
+                    ex,
+                    exc_info=True,
+                )
         else:
-            watching_callbacks = self._watching_callbacks[start_count : self._end_count]
-        return [callbacks[-1] for callbacks in watching_callbacks]
+            callback()
+
+    def _execute(self):
+        """
+        Execute watched callbacks by index and remove them from the connection list at once. Callbacks registered
+        by the executed callbacks stay in the list after the watched ones.
+        """
+        executed_callbacks = []
+        try:
+            i = self._start_count
+            while i < self._get_end_count():
+                callback_item = self._watching_callbacks[i]
+                executed_callbacks.append(callback_item[1])
+                self._call(callback_item)
+                i += 1
+        finally:
+            if executed_callbacks:
+                del self._watching_callbacks[
+                    self._start_count : self._start_count + len(executed_callbacks)
+                ]
+                if self._end_count is not None:
+                    self._end_count -= len(executed_callbacks)
+        return executed_callbacks
 
     def execute(self):
         if self._executed:
             raise RuntimeError("callback was already executed")
+        self._executed = True
+        return self._execute()
 
-        executed_callbacks = []
-        start_count = self._start_count
-        while True:
-            callbacks = self.get_callbacks(start_count)
-            if not callbacks:
-                break
-            executed_callbacks.append(callbacks[0])
-            callbacks[0]()
-            start_count += 1
-
-        if executed_callbacks:
-            self._set_watching_callback(
-                self._watching_callbacks[: self._start_count]
-                + self._watching_callbacks[
-                    self._start_count + len(executed_callbacks) :
-                ]
-            )
 
-        return executed_callbacks
+class MultiDatabaseCatchCallbacks:
+    """
+    Callbacks of more database connections with the same interface as CatchCallbacks. Callbacks are executed in
+    the order of the databases.
+    """
+
+    def __init__(self, db_connections, callback_name):
+        self.catch_callbacks = [
+            CatchCallbacks(connection, callback_name) for connection in db_connections
+        ]
+
+    def end(self):
+        for catch_callbacks in self.catch_callbacks:
+            catch_callbacks.end()
+
+    def get_callbacks(self):
+        return [
+            callback
+            for catch_callbacks in self.catch_callbacks
+            for callback in catch_callbacks.get_callbacks()
+        ]
+
+    def _execute(self):
+        return [
+            callback
+            for catch_callbacks in self.catch_callbacks
+            for callback in catch_callbacks._execute()
+        ]
+
+    def execute(self):
+        return [
+            callback
+            for catch_callbacks in self.catch_callbacks
+            for callback in catch_callbacks.execute()
+        ]
 
 
 class CommitCallbacks:
 
-    def __init__(self, connection):
-        self.pre_commit = CatchCallbacks(connection, "run_pre_commit")
-        self.on_commit = CatchCallbacks(connection, "run_on_commit")
+    def __init__(self, db_connections):
+        self.pre_commit = MultiDatabaseCatchCallbacks(db_connections, "run_pre_commit")
+        self.on_commit = MultiDatabaseCatchCallbacks(db_connections, "run_on_commit")
 
     def end(self):
         self.pre_commit.end()
@@ -76,13 +141,25 @@ class CommitCallbacks:
         return self.on_commit.execute()
 
     def execute_on_commit_cascade(self):
-        with capture_commit_callbacks(execute_pre_commit=True) as callbacks:
-            executed_callbacks = self.execute_on_commit()
-
-        # start count must be updated because current callback removed some values from run_on_commit list
-        callbacks.on_commit._start_count -= len(executed_callbacks)
-        if callbacks.on_commit.get_callbacks():
-            callbacks.execute_on_commit_cascade()
+        """
+        Execute on commit callbacks and then callbacks registered by the executed callbacks until no new callback
+        is registered. Pre commit callbacks registered by the callbacks are executed after every level.
+        """
+        executed_callbacks = self.execute_on_commit()
+        while executed_callbacks:
+            # New callbacks are at the place of the executed ones
+            self.end()
+            self.pre_commit._execute()
+            executed_callbacks = self.on_commit._execute()
+
+
+def get_connections(using):
+    if using == ALL_DATABASES:
+        return list(connections.all())
+    elif isinstance(using, str):
+        return [connections[using]]
+    else:
+        return [connections[alias] for alias in using]
 
 
 @contextmanager
@@ -93,7 +170,11 @@ def capture_commit_callbacks(
     execute_on_commit=False,
     execute_on_commit_cascade=False
 ):
-    callbacks = CommitCallbacks(connections[using])
+    """
+    Capture pre commit and on commit callbacks of the database (using can be the database alias, list of aliases or
+    ALL_DATABASES) and optionally execute them at the end of the context.
+    """
+    callbacks = CommitCallbacks(get_connections(using))
     try:
         yield callbacks
     finally:
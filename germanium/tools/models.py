@@ -1,13 +1,52 @@
-from django.core.exceptions import ObjectDoesNotExist
+import os
+import re
+import sys
+import sysconfig
+import time
+
+from collections import Counter, defaultdict
+from contextlib import ContextDecorator
+from functools import lru_cache
+
+import django
+
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
 from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import ForeignObjectRel, QuerySet, prefetch_related_objects
 from django.db.models.constants import LOOKUP_SEP
 from django.test.utils import CaptureQueriesContext
 from django.contrib.contenttypes.models import ContentType
 
-from .trivials import assert_equal, assert_true, assert_false
+from germanium.decorators import refresh_model_objects
+
+from .trivials import assert_equal, assert_true, assert_false, fail
+
+__all__ = [
+    "get_pks",
+    "assert_iterable_equal",
+    "assert_qs_exists",
+    "assert_qs_not_exists",
+    "assert_qs_contains",
+    "assert_qs_not_contains",
+    "model_instance_getattr",
+    "get_value_from_model_instance",
+    "assert_equal_model_fields",
+    "assert_num_queries",
+    "get_sql_fingerprint",
+    "get_call_site",
+    "CapturedQuery",
+    "QueryRecorder",
+    "QueryStats",
+    "assert_query_budget",
+]
+
+IN_LOOKUP_BATCH_SIZE = 10000
+DIFF_SAMPLE_SIZE = 10
 
 
 def get_pks(iterable):
+    if isinstance(iterable, QuerySet):
+        return list(iterable.values_list("pk", flat=True))
     return [obj.pk for obj in iterable]
 
 
@@ -23,25 +62,83 @@ def assert_qs_not_exists(qs, msg=None):
     assert_false(qs.exists(), msg)
 
 
+def _get_in_lookup_batch_size(qs):
+    max_query_params = connections[qs.db].features.max_query_params
+    if max_query_params:
+        # Keep space for parameters of the queryset filters
+        return max(min(max_query_params // 2, IN_LOOKUP_BATCH_SIZE), 1)
+    return IN_LOOKUP_BATCH_SIZE
+
+
+def _filter_pks(qs, pks):
+    """
+    Return set of pks from the list which are in the queryset, long IN lists are split into batches.
+    """
+    batch_size = _get_in_lookup_batch_size(qs)
+    pks_qs = qs.order_by().values_list("pk", flat=True)
+    return {
+        pk
+        for i in range(0, len(pks), batch_size)
+        for pk in pks_qs.filter(pk__in=pks[i : i + batch_size])
+    }
+
+
+def _fail_qs_diff(standard_msg, pks, msg):
+    try:
+        sample = sorted(pks)[:DIFF_SAMPLE_SIZE]
+    except TypeError:
+        sample = sorted(pks, key=str)[:DIFF_SAMPLE_SIZE]
+    standard_msg = "{}, pks: {}{}".format(
+        standard_msg,
+        ", ".join(str(pk) for pk in sample),
+        ", ..." if len(pks) > len(sample) else "",
+    )
+    fail(standard_msg if msg is None else "{} : {}".format(standard_msg, msg))
+
+
 def assert_qs_contains(qs, obj, msg=None):
-    assert_equal(
-        set(
-            qs.filter(
-                pk__in=get_pks(obj if isinstance(obj, (set, list, tuple)) else {obj})
+    """
+    Assert that the queryset contains the object, the iterable of objects or all objects of the second queryset.
+    Only primary keys are compared, the check of two querysets is performed in one SQL query.
+    """
+    if isinstance(obj, QuerySet):
+        missing_pks = list(
+            obj.order_by()
+            .exclude(pk__in=qs.order_by().values("pk"))
+            .values_list("pk", flat=True)[: DIFF_SAMPLE_SIZE + 1]
+        )
+        if missing_pks:
+            _fail_qs_diff("Objects are missing in the queryset", missing_pks, msg)
+    else:
+        pks = list(set(get_pks(obj if isinstance(obj, (set, list, tuple)) else {obj})))
+        missing_pks = set(pks) - _filter_pks(qs, pks)
+        if missing_pks:
+            _fail_qs_diff(
+                "{} of {} objects are missing in the queryset".format(
+                    len(missing_pks), len(pks)
+                ),
+                missing_pks,
+                msg,
             )
-        ),
-        set(obj) if isinstance(obj, (set, list, tuple)) else {obj},
-        msg,
-    )
 
 
 def assert_qs_not_contains(qs, obj, msg=None):
-    assert_false(
-        qs.filter(
-            pk__in=get_pks(obj if isinstance(obj, (set, list, tuple)) else {obj})
-        ).exists(),
-        msg,
-    )
+    """
+    Assert that the queryset does not contain the object, any object from the iterable or from the second queryset.
+    """
+    if isinstance(obj, QuerySet):
+        found_pks = list(
+            qs.order_by()
+            .filter(pk__in=obj.order_by().values("pk"))
+            .values_list("pk", flat=True)[: DIFF_SAMPLE_SIZE + 1]
+        )
+    else:
+        found_pks = _filter_pks(
+            qs,
+            list(set(get_pks(obj if isinstance(obj, (set, list, tuple)) else {obj}))),
+        )
+    if found_pks:
+        _fail_qs_diff("Objects are in the queryset", found_pks, msg)
 
 
 def model_instance_getattr(instance, key):
@@ -62,16 +159,92 @@ def get_value_from_model_instance(instance, field_name):
         return model_instance_getattr(instance, field_name)
 
 
-def assert_equal_model_fields(instance, refresh_from_db=False, **field_values):
-    if refresh_from_db:
-        instance.refresh_from_db()
-    for field_name, field_value in field_values.items():
-        assert_equal(
-            get_value_from_model_instance(instance, field_name),
-            field_value,
-            'Invalid value of "{}"'.format(field_name),
+def _get_relation_lookups(model, field_names):
+    """
+    Return select_related and prefetch_related lookups of the relations used in the "__" separated field names.
+    Single-valued relations are selected, generic foreign keys are prefetched. Attributes which are not model fields
+    end the lookup.
+    """
+    select_related, prefetch_related = set(), set()
+    for field_name in field_names:
+        path = []
+        current_model = model
+        for name in field_name.split(LOOKUP_SEP)[:-1]:
+            try:
+                field = current_model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if (
+                not field.is_relation
+                or field.many_to_many
+                or field.one_to_many
+                or (
+                    isinstance(field, ForeignObjectRel)
+                    and field.get_accessor_name() != name
+                )
+            ):
+                break
+            path.append(name)
+            if field.related_model is None:
+                prefetch_related.add(LOOKUP_SEP.join(path))
+                path = None
+                break
+            current_model = field.related_model
+        if path:
+            select_related.add(LOOKUP_SEP.join(path))
+    return select_related, prefetch_related
+
+
+def _load_model_instances(instances, refresh_from_db, field_names):
+    if isinstance(instances, QuerySet):
+        select_related, prefetch_related = _get_relation_lookups(
+            instances.model, field_names
+        )
+        return list(
+            instances.select_related(*select_related).prefetch_related(
+                *prefetch_related
+            )
         )
 
+    instances = (
+        list(instances) if isinstance(instances, (list, tuple, set)) else [instances]
+    )
+    instances_by_model = defaultdict(list)
+    for instance in instances:
+        instances_by_model[type(instance)].append(instance)
+    for model, model_instances in instances_by_model.items():
+        select_related, prefetch_related = _get_relation_lookups(model, field_names)
+        if refresh_from_db:
+            refresh_model_objects(*model_instances, select_related=select_related)
+            prefetch_related_objects(model_instances, *prefetch_related)
+        else:
+            prefetch_related_objects(
+                model_instances, *select_related, *prefetch_related
+            )
+    return instances
+
+
+def assert_equal_model_fields(instance, refresh_from_db=False, **field_values):
+    """
+    Assert field values of the model instance, list of instances or all instances of the queryset. Relations used
+    in the "__" separated field names are loaded up front for all instances (with select_related if the instances
+    are reloaded from the database, with prefetch otherwise), therefore the number of queries does not depend on the
+    number of instances.
+    """
+    for inst in _load_model_instances(instance, refresh_from_db, field_values):
+        for field_name, field_value in field_values.items():
+            assert_equal(
+                get_value_from_model_instance(inst, field_name),
+                field_value,
+                (
+                    'Invalid value of "{}"'.format(field_name)
+                    if inst is instance
+                    else 'Invalid value of "{}" of {} with pk {}'.format(
+                        field_name, inst._meta.object_name, inst.pk
+                    )
+                ),
+            )
+
 
 class _AssertNumQueriesContext(CaptureQueriesContext):
 
@@ -122,3 +295,286 @@ def assert_num_queries(
 
     with context:
         func(*args, **kwargs)
+
+
+SQL_FINGERPRINT_SUBSTITUTIONS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r'"s\d+_x\d+"'), '"s?"'),
+    (re.compile(r"%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\( ?\?(?: ?, ?\?)* ?\)"), "(...)"),
+    (re.compile(r"\(\.\.\.\)(?: ?, ?\(\.\.\.\))+"), "(...)"),
+)
+
+
+@lru_cache(maxsize=10000)
+def get_sql_fingerprint(sql):
+    """
+    Normalize SQL to the fingerprint which is the same for all queries which differ only in parameters, literals,
+    length of IN lists or number of inserted rows.
+    """
+    fingerprint = str(sql)
+    for pattern, replacement in SQL_FINGERPRINT_SUBSTITUTIONS:
+        fingerprint = pattern.sub(replacement, fingerprint)
+    return fingerprint.strip()
+
+
+IGNORED_CALL_SITE_PATHS = (
+    os.path.dirname(django.__file__) + os.sep,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep,
+    sysconfig.get_paths()["stdlib"] + os.sep,
+    sysconfig.get_paths()["purelib"] + os.sep,
+)
+
+
+@lru_cache(maxsize=10000)
+def _is_call_site_file(filename):
+    return not os.path.abspath(filename).startswith(IGNORED_CALL_SITE_PATHS)
+
+
+def get_call_site(frame):
+    """
+    Return "file:line in function" of the first frame outside Django, Germanium, standard library and installed
+    packages.
+    """
+    while frame is not None:
+        if _is_call_site_file(frame.f_code.co_filename):
+            return "{}:{} in {}".format(
+                frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name
+            )
+        frame = frame.f_back
+    return None
+
+
+class CapturedQuery:
+
+    def __init__(self, sql, params, many, duration, call_site):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.duration = duration
+        self.call_site = call_site
+
+    @property
+    def fingerprint(self):
+        return get_sql_fingerprint(self.sql)
+
+    def __str__(self):
+        return self.sql
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper which records SQL, parameters, duration and call site of executed queries.
+    """
+
+    def __init__(self, record_call_site=True):
+        self.record_call_site = record_call_site
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        call_site = get_call_site(sys._getframe(1)) if self.record_call_site else None
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                CapturedQuery(sql, params, many, time.perf_counter() - start, call_site)
+            )
+
+
+class QueryStats:
+    """
+    Statistics of the captured queries grouped by the SQL fingerprint.
+    """
+
+    def __init__(self, queries):
+        self.queries = list(queries)
+        self.queries_by_fingerprint = defaultdict(list)
+        for query in self.queries:
+            self.queries_by_fingerprint[query.fingerprint].append(query)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    @property
+    def fingerprints_count(self):
+        return len(self.queries_by_fingerprint)
+
+    @property
+    def max_repeats(self):
+        return max(
+            (len(queries) for queries in self.queries_by_fingerprint.values()),
+            default=0,
+        )
+
+    def get_repeated_fingerprints(self, threshold=1):
+        """
+        Return list of tuples (fingerprint, queries) of fingerprints executed more than threshold times ordered by
+        the number of queries.
+        """
+        return sorted(
+            (
+                (fingerprint, queries)
+                for fingerprint, queries in self.queries_by_fingerprint.items()
+                if len(queries) > threshold
+            ),
+            key=lambda item: (-len(item[1]), -sum(q.duration for q in item[1])),
+        )
+
+    def get_duplicates(self, queries=None):
+        """
+        Return list of tuples (sql, params, count) of identical queries (the same SQL and parameters) executed more
+        than once ordered by the count. Only the queries from the argument are checked if it is set.
+        """
+        counter = Counter(
+            (query.sql, repr(query.params))
+            for query in (self.queries if queries is None else queries)
+        )
+        return [
+            (sql, params, count)
+            for (sql, params), count in counter.most_common()
+            if count > 1
+        ]
+
+    def format(self, limit=10):
+        lines = [
+            "{} queries ({} distinct) in {:.3f}s".format(
+                self.count, self.fingerprints_count, self.duration
+            )
+        ]
+        for fingerprint, queries in self.get_repeated_fingerprints(0)[:limit]:
+            lines.append(
+                "{:5d}x {:8.3f}s {}".format(
+                    len(queries), sum(q.duration for q in queries), fingerprint
+                )
+            )
+            for call_site, count in Counter(
+                query.call_site for query in queries
+            ).most_common(3):
+                lines.append("{:16}{}x {}".format("", count, call_site))
+        duplicates = self.get_duplicates()
+        if duplicates:
+            lines.append("identical queries:")
+            for sql, params, count in duplicates[:limit]:
+                lines.append("{:5d}x {} {}".format(count, sql, params))
+        return "\n".join(lines)
+
+
+class _AssertQueryBudgetContext(ContextDecorator, _AssertNumQueriesContext):
+
+    def __init__(
+        self,
+        connection,
+        clear_content_type_cache,
+        num=None,
+        max_num=None,
+        max_time=None,
+        max_fingerprints=None,
+        max_repeats=None,
+    ):
+        super().__init__(num, connection, clear_content_type_cache)
+        self.max_num = max_num
+        self.max_time = max_time
+        self.max_fingerprints = max_fingerprints
+        self.max_repeats = max_repeats
+        self.stats = None
+
+    def __enter__(self):
+        self.stats = None
+        self.query_recorder = QueryRecorder()
+        self.connection.execute_wrappers.append(self.query_recorder)
+        super().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        CaptureQueriesContext.__exit__(self, exc_type, exc_value, traceback)
+        self.connection.execute_wrappers.remove(self.query_recorder)
+        self.stats = QueryStats(self.query_recorder.queries)
+        if exc_type is not None:
+            return
+
+        errors = []
+        if self.num is not None and self.stats.count != self.num:
+            errors.append(
+                "{} queries executed, {} expected".format(self.stats.count, self.num)
+            )
+        if self.max_num is not None and self.stats.count > self.max_num:
+            errors.append(
+                "{} queries executed, {} allowed".format(self.stats.count, self.max_num)
+            )
+        if self.max_time is not None and self.stats.duration > self.max_time:
+            errors.append(
+                "queries took {:.3f}s, {:.3f}s allowed".format(
+                    self.stats.duration, self.max_time
+                )
+            )
+        if (
+            self.max_fingerprints is not None
+            and self.stats.fingerprints_count > self.max_fingerprints
+        ):
+            errors.append(
+                "{} distinct queries executed, {} allowed".format(
+                    self.stats.fingerprints_count, self.max_fingerprints
+                )
+            )
+        if self.max_repeats is not None:
+            for fingerprint, queries in self.stats.get_repeated_fingerprints(
+                self.max_repeats
+            ):
+                duplicates = self.stats.get_duplicates(queries)
+                errors.append(
+                    "query executed {} times ({} identical), {} allowed: {}".format(
+                        len(queries),
+                        duplicates[0][2] if duplicates else 1,
+                        self.max_repeats,
+                        fingerprint,
+                    )
+                )
+        if errors:
+            raise AssertionError(
+                "Query budget exceeded:\n{}\n\n{}".format(
+                    "\n".join(errors), self.stats.format()
+                )
+            )
+
+
+def assert_query_budget(
+    func=None,
+    *args,
+    using=DEFAULT_DB_ALIAS,
+    num=None,
+    max_num=None,
+    max_time=None,
+    max_fingerprints=None,
+    max_repeats=None,
+    clear_content_type_cache=False,
+    **kwargs
+):
+    """
+    Context manager or decorator which profiles DB queries and checks the budget: exact number of queries (num),
+    maximal number of queries (max_num), total query time in seconds (max_time), number of distinct SQL
+    fingerprints (max_fingerprints) and number of queries with the same fingerprint (max_repeats, N+1 queries).
+    Captured statistics are available in the attribute "stats" of the context.
+    """
+    context = _AssertQueryBudgetContext(
+        connections[using],
+        clear_content_type_cache,
+        num=num,
+        max_num=max_num,
+        max_time=max_time,
+        max_fingerprints=max_fingerprints,
+        max_repeats=max_repeats,
+    )
+
+    if func is None:
+        return context
+
+    with context:
+        func(*args, **kwargs)
+    return context
@@ -15,7 +15,7 @@ setup(
         'Programming Language :: Python',
     ],
     install_requires=[
-        'django>=2.2',
+        'django>=4.1',
     ],
     extras_require={
         'selenium': ['selenium>=2.37.2', 'PyVirtualDisplay>=0.1.2']
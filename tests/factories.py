@@ -0,0 +1,20 @@
+import factory
+
+from .models import Author, Book
+
+
+class AuthorFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = Author
+
+    name = factory.Sequence(lambda n: "Author {}".format(n))
+
+
+class BookFactory(factory.django.DjangoModelFactory):
+
+    class Meta:
+        model = Book
+
+    title = factory.Sequence(lambda n: "Book {}".format(n))
+    author = factory.SubFactory(AuthorFactory)
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class Author(models.Model):
+
+    name = models.CharField(max_length=100)
+
+
+class Tag(models.Model):
+
+    name = models.CharField(max_length=100)
+
+
+class Book(models.Model):
+
+    title = models.CharField(max_length=100)
+    author = models.ForeignKey(Author, on_delete=models.CASCADE)
+    tags = models.ManyToManyField(Tag, blank=True)
+
+
+class RefreshedAuthor(Author):
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.refreshed = True
@@ -0,0 +1,43 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SECRET_KEY = "germanium-tests"
+
+INSTALLED_APPS = [
+    "django.contrib.contenttypes",
+    "django.contrib.auth",
+    "tests",
+]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Test commands run from the tests use their own database
+        "TEST": {
+            "NAME": os.path.join(
+                BASE_DIR, os.environ.get("GERMANIUM_TEST_DB_NAME", "test_db.sqlite3")
+            )
+        },
+    },
+    # Second database of the multi-database tests
+    "other": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    },
+}
+
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+
+USE_TZ = True
+
+TEST_RUNNER = "germanium.django.runner.GermaniumDiscoverRunner"
+ROOT_URLCONF = "tests.urls"
+MEDIA_URL = "/media/"
+
+# Test commands run from the tests can record test durations
+GERMANIUM_TEST_DURATIONS_FILE = os.environ.get("GERMANIUM_TEST_DURATIONS_FILE")
+
+# Test commands run from the tests can load test case fixtures from the snapshot
+GERMANIUM_SNAPSHOT_FIXTURES = bool(os.environ.get("GERMANIUM_SNAPSHOT_FIXTURES"))
@@ -0,0 +1,20 @@
+from germanium.test_cases.default import GermaniumTestCase
+
+from tests.models import Author, Book
+
+
+class NPlusOneTestCase(GermaniumTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(10):
+            Book.objects.create(title=str(i), author=Author.objects.create(name=str(i)))
+
+    def set_up(self):
+        for i in range(10):
+            Author.objects.create(name=str(i))
+
+    def test_n_plus_one(self):
+        for i in range(10):
+            Author.objects.create(name=str(i))
+        [book.author.name for book in Book.objects.all()]
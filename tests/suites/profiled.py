@@ -0,0 +1,21 @@
+from germanium.decorators import profile_test
+from germanium.test_cases.default import GermaniumTestCase
+
+
+class ProfiledTestCase(GermaniumTestCase):
+
+    @profile_test
+    def test_profiled(self):
+        sum(i * i for i in range(1000000))
+
+
+class NotProfiledTestCase(GermaniumTestCase):
+
+    def test_not_profiled(self):
+        pass
+
+
+class OtherNotProfiledTestCase(GermaniumTestCase):
+
+    def test_not_profiled(self):
+        pass
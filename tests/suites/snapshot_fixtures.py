@@ -0,0 +1,28 @@
+import os
+
+
+from germanium.django.fixtures import fixture_snapshots, get_fixture_digest
+from germanium.test_cases.default import GermaniumTestCase
+from germanium.tools import assert_equal, assert_in
+
+from tests.models import Author, Book
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SnapshotFixturesTestCase(GermaniumTestCase):
+
+    fixtures = ["authors", os.path.join(TESTS_DIR, "fixture_files", "books.json")]
+
+    def test_fixtures_should_be_loaded_from_snapshot(self):
+        assert_equal(Author.objects.count(), 2)
+        assert_equal(Book.objects.count(), 2)
+        # Fixture label is resolved to the fixture file and loaded from the snapshot
+        assert_in(
+            get_fixture_digest(os.path.join(TESTS_DIR, "fixtures", "authors.json")),
+            fixture_snapshots,
+        )
+
+
+class OtherSnapshotFixturesTestCase(SnapshotFixturesTestCase):
+    pass
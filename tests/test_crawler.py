@@ -0,0 +1,504 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.db import connection
+from django.http import JsonResponse
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase
+
+from germanium.crawler import (
+    CrawlCheckpoint,
+    CrawlFrontier,
+    Crawler,
+    CrawlReport,
+    ExcludeMatcher,
+    HTMLLinkExtractor,
+    JSONLinkExtractor,
+    LinkExtractor,
+    URLWithReferer,
+    canonicalize_url,
+)
+from germanium.tools import (
+    assert_equal,
+    assert_in,
+    assert_false,
+    assert_is,
+    assert_not_equal,
+    assert_raises,
+    assert_true,
+)
+
+from .models import Author
+
+
+class CrawlerProcessesTransactionTestCase(TransactionTestCase):
+
+    # Every process clones all test databases
+    databases = {"default", "other"}
+
+    def test_crawler_with_processes_should_crawl_all_urls_with_cloned_database(self):
+        Author.objects.create(name="Crawled author")
+        urls = {"/pages/{}/".format(i) for i in range(1, 20)}
+        # Pages render names of the authors, therefore sizes are equal only if the data is in the cloned database
+        sizes = {url: len(Client().get(url).content) for url in urls}
+
+        db_connection = connection.connection
+        report = CrawlReport()
+        crawler = Crawler(Client(), ("/pages/1/",), processes=2, report=report)
+        crawler.run()
+        assert_equal(crawler.crawled_urls, urls)
+        assert_equal(
+            {record["url"]: record["size"] for record in report.records}, sizes
+        )
+        # Connection of the test is not closed
+        assert_is(connection.connection, db_connection)
+        assert_equal(Author.objects.count(), 1)
+
+    def test_crawler_with_processes_should_stop_after_max_pages(self):
+        crawler = Crawler(Client(), ("/pages/1/",), max_pages=6, processes=2)
+        crawler.run()
+        assert_true(0 < len(crawler.crawled_urls) <= 6)
+
+    def test_crawler_with_processes_should_raise_post_response_exception(self):
+        def post_response(url, referer, resp, exception):
+            if url == "/pages/6/":
+                raise AssertionError("Invalid page {}".format(url))
+
+        for _ in range(3):
+            crawler = Crawler(
+                Client(), ("/pages/1/",), post_response=post_response, processes=2
+            )
+            with assert_raises(AssertionError) as context:
+                crawler.run()
+            assert_equal(str(context.exception), "Invalid page /pages/6/")
+            assert_in("post_response", str(context.exception.__cause__))
+
+
+class CrawlerWorkersTransactionTestCase(TransactionTestCase):
+
+    def test_crawler_with_workers_should_crawl_all_urls(self):
+        crawler = Crawler(Client(), ("/pages/1/",), workers=4)
+        crawler.run()
+        assert_equal(
+            crawler.crawled_urls, {"/pages/{}/".format(i) for i in range(1, 20)}
+        )
+
+    def test_crawler_with_workers_should_raise_post_response_exception(self):
+        def post_response(url, referer, resp, exception):
+            if url == "/pages/1/":
+                raise AssertionError("Invalid page {}".format(url))
+
+        crawler = Crawler(
+            Client(), ("/pages/1/",), post_response=post_response, workers=4
+        )
+        with assert_raises(AssertionError) as context:
+            crawler.run()
+        assert_equal(str(context.exception), "Invalid page /pages/1/")
+
+
+class CrawlerProcessesTestCase(TestCase):
+
+    def test_crawler_with_processes_inside_transaction_should_raise_error(self):
+        with assert_raises(RuntimeError):
+            Crawler(Client(), ("/pages/1/",), processes=2).run()
+        assert_equal(Author.objects.count(), 0)
+
+
+class OverriddenHTMLLinkExtractor(HTMLLinkExtractor):
+
+    def extract(self, content):
+        return {"/pages/3/"}
+
+
+class CustomLinkExtractor(LinkExtractor):
+
+    def extract(self, content):
+        return {"/pages/3/"}
+
+
+class DuckTypedLinkExtractor:
+
+    def extract(self, content):
+        return {"/pages/3/"}
+
+
+class CrawlerLinkExtractorsTestCase(TestCase):
+
+    def test_crawler_should_use_extract_of_custom_link_extractors(self):
+        for link_extractor in (
+            OverriddenHTMLLinkExtractor(),
+            CustomLinkExtractor(),
+            DuckTypedLinkExtractor(),
+        ):
+            with self.subTest(link_extractor=type(link_extractor).__name__):
+                crawler = Crawler(
+                    Client(),
+                    ("/pages/1/",),
+                    extra_link_extractors={"text/html": link_extractor},
+                )
+                crawler.run()
+                assert_equal(crawler.crawled_urls, {"/pages/1/", "/pages/3/"})
+
+
+class JSONLinkExtractorTestCase(SimpleTestCase):
+
+    payloads = (
+        # HAL
+        (
+            {
+                "_links": {
+                    "self": {
+                        "href": "/api/books/1/",
+                        "title": "Book detail",
+                        "type": "application/json",
+                    },
+                    "author": {"href": "/api/authors/1/", "name": "author"},
+                    "item": [{"href": "/api/books/2/", "title": "Other book"}],
+                },
+                "title": "Book",
+            },
+            {"/api/books/1/", "/api/authors/1/", "/api/books/2/"},
+        ),
+        # JSON:API
+        (
+            {
+                "links": {"self": "/api/books/", "next": "/api/books/?page=2"},
+                "data": [
+                    {
+                        "type": "books",
+                        "id": "1",
+                        "attributes": {"title": "Book"},
+                        "links": {"self": "/api/books/1/"},
+                        "relationships": {
+                            "author": {
+                                "links": {
+                                    "related": {
+                                        "href": "/api/authors/1/",
+                                        "meta": {"name": "author"},
+                                    }
+                                },
+                                "data": {"type": "authors", "id": "1"},
+                            }
+                        },
+                    }
+                ],
+            },
+            {"/api/books/", "/api/books/?page=2", "/api/books/1/", "/api/authors/1/"},
+        ),
+        # Link keys and DRF pagination
+        (
+            {
+                "next": "/api/books/?page=3",
+                "previous": None,
+                "results": [{"url": "/api/books/5/", "title": "Book"}],
+            },
+            {"/api/books/?page=3", "/api/books/5/"},
+        ),
+    )
+
+    def test_json_link_extractor_should_extract_only_links(self):
+        link_extractor = JSONLinkExtractor()
+        for payload, links in self.payloads:
+            with self.subTest(links=links):
+                assert_equal(link_extractor.extract(json.dumps(payload)), links)
+                assert_equal(
+                    link_extractor.extract_from_response(JsonResponse(payload)), links
+                )
+
+
+class ExcludeMatcherTestCase(SimpleTestCase):
+
+    def test_exclude_matcher_should_match_whole_urls(self):
+        matcher = ExcludeMatcher(
+            (r"/admin/.*", r"/pages/\d+/", r"/books/[a-z]+/", r"/a/|/b/"),
+            prefixes=("/static/",),
+        )
+        for url, matched in (
+            ("/admin/", True),
+            ("/admin/users/", True),
+            ("/static/app.js", True),
+            ("/pages/12/", True),
+            ("/pages/12/edit/", False),
+            ("/books/novel/", True),
+            ("/books/1/", False),
+            # Alternation is not grouped as before
+            ("/a/other/", True),
+            ("/b/", True),
+            ("/other/b/", False),
+        ):
+            with self.subTest(url=url):
+                assert_equal(matcher.match(url), matched)
+
+    def test_exclude_matcher_should_match_patterns_with_groups(self):
+        matcher = ExcludeMatcher(
+            (
+                r"/a/(?P<pk>\d+)/",
+                r"/b/(?P<pk>\d+)/",
+                r"/c/(\d+)/\1/",
+                r"/pages/\d+/",
+            )
+        )
+        for url, matched in (
+            ("/a/1/", True),
+            ("/b/2/", True),
+            ("/c/3/3/", True),
+            ("/c/3/4/", False),
+            ("/pages/1/", True),
+            ("/pages/", False),
+        ):
+            with self.subTest(url=url):
+                assert_equal(matcher.match(url), matched)
+
+
+class CrawlFrontierTestCase(SimpleTestCase):
+
+    def test_canonicalize_url_should_ignore_url_differences_of_the_same_page(self):
+        for url in (
+            "/pages/1/?b=2&a=1",
+            "/pages/1?a=1&b=2",
+            "/pages/1/?a=1&b=2#content",
+            "http://testserver/pages/1/?a=1&b=2",
+            "HTTP://TESTSERVER:80/pages/1/?a=1&b=2",
+        ):
+            with self.subTest(url=url):
+                assert_equal(canonicalize_url(url), "/pages/1?a=1&b=2")
+        assert_equal(canonicalize_url("/"), "/")
+        assert_equal(canonicalize_url("?a="), "/?a=")
+        assert_equal(canonicalize_url("http://Example.com/a/"), "http://example.com/a")
+        assert_not_equal(
+            canonicalize_url("/pages/1/?a=1"), canonicalize_url("/pages/1/?a=2")
+        )
+        assert_not_equal(canonicalize_url("/Pages/1/"), canonicalize_url("/pages/1/"))
+
+    def test_frontier_should_deduplicate_urls_and_pop_them_by_depth(self):
+        frontier = CrawlFrontier()
+        assert_true(frontier.add(URLWithReferer("/c/", depth=2)))
+        assert_true(frontier.add(URLWithReferer("/a/", depth=0)))
+        assert_true(frontier.add(URLWithReferer("/b/", depth=1)))
+        assert_false(frontier.add(URLWithReferer("/a#top", depth=0)))
+        assert_equal(len(frontier), 3)
+        assert_equal([frontier.pop().url for _ in range(3)], ["/a/", "/b/", "/c/"])
+        # Popped URL is not accepted again
+        assert_false(frontier.add(URLWithReferer("/a/")))
+        assert_false(frontier)
+        with assert_raises(KeyError):
+            frontier.pop()
+
+    def test_frontier_should_limit_depth_pages_and_patterns(self):
+        frontier = CrawlFrontier(
+            max_depth=1, max_pages=3, pattern_limits={r"^/items/\d+/": 2}
+        )
+        assert_false(frontier.add(URLWithReferer("/deep/", depth=2)))
+        for i in range(4):
+            frontier.add(URLWithReferer("/items/{}/".format(i), depth=1))
+        assert_true(frontier.add(URLWithReferer("/", depth=0)))
+        assert_true(frontier.add(URLWithReferer("/other/", depth=1)))
+        assert_equal(frontier.get_pattern_counts(), {r"^/items/\d+/": 2})
+        assert_equal(len(frontier), 3)
+        assert_equal(
+            [frontier.pop().url for _ in range(3)], ["/", "/items/0/", "/items/1/"]
+        )
+        assert_true(frontier.is_exhausted)
+        assert_false(frontier)
+        # URLs over max_pages are kept for the checkpoint, but they are not popped
+        assert_true(frontier.add(URLWithReferer("/new/", depth=0)))
+        assert_false(frontier)
+        assert_equal(
+            [url_with_referer.url for url_with_referer in frontier],
+            ["/new/", "/other/"],
+        )
+
+    def test_frontier_should_pop_urls_by_priority(self):
+        frontier = CrawlFrontier(
+            priority=lambda url_with_referer: -len(url_with_referer.url)
+        )
+        for url in ("/a/", "/aaa/", "/aa/"):
+            frontier.add(URLWithReferer(url))
+        assert_equal([frontier.pop().url for _ in range(3)], ["/aaa/", "/aa/", "/a/"])
+
+
+class CrawlerLimitsTestCase(TestCase):
+
+    def crawl(self, **kwargs):
+        crawler = Crawler(Client(), ("/pages/1/",), **kwargs)
+        crawler.run()
+        return crawler.crawled_urls
+
+    def test_crawler_should_crawl_urls_to_max_depth(self):
+        assert_equal(
+            self.crawl(max_depth=2), {"/pages/{}/".format(i) for i in range(1, 8)}
+        )
+
+    def test_crawler_should_crawl_max_pages_from_the_lowest_depth(self):
+        crawled_urls = self.crawl(max_pages=5)
+        assert_equal(len(crawled_urls), 5)
+        # Links of one page are not ordered, only the depth is guaranteed
+        assert_true({"/pages/1/", "/pages/2/", "/pages/3/"} <= crawled_urls)
+        assert_true(crawled_urls <= {"/pages/{}/".format(i) for i in range(1, 8)})
+
+    def test_crawler_should_crawl_limited_number_of_urls_matching_pattern(self):
+        crawled_urls = self.crawl(pattern_limits={r"^/pages/1\d/$": 3})
+        assert_equal(len(crawled_urls), 12)
+        assert_true({"/pages/{}/".format(i) for i in range(1, 10)} <= crawled_urls)
+
+    def test_crawler_should_not_crawl_duplicate_urls(self):
+        crawler = Crawler(
+            Client(), ("/pages/1/", "/pages/1", "http://testserver/pages/1/#top")
+        )
+        crawler.run()
+        assert_equal(len(crawler.crawled_urls), 19)
+
+
+class CrawlerCheckpointTestCase(TestCase):
+
+    all_urls = {"/pages/{}/".format(i) for i in range(1, 20)}
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.checkpoint_path = os.path.join(tmp_dir.name, "crawl.sqlite")
+
+    def create_crawler(self, requested_urls, **kwargs):
+        crawler = Crawler(
+            Client(),
+            ("/pages/1/",),
+            checkpoint_path=self.checkpoint_path,
+            post_response=lambda url, referer, resp, exception: requested_urls.append(
+                url
+            ),
+            **kwargs,
+        )
+        self.addCleanup(crawler.checkpoint.close)
+        return crawler
+
+    def test_resumed_crawler_should_continue_split_crawl(self):
+        first_urls, second_urls = [], []
+        self.create_crawler(first_urls, max_pages=5).run()
+        assert_equal(len(first_urls), 5)
+
+        crawler = self.create_crawler(second_urls)
+        crawler.resume()
+        assert_equal(len(second_urls), 14)
+        assert_equal(set(first_urls) | set(second_urls), self.all_urls)
+        assert_equal(crawler.crawled_urls, self.all_urls)
+
+        checkpoint = CrawlCheckpoint(self.checkpoint_path)
+        self.addCleanup(checkpoint.close)
+        assert_equal(
+            {url: status_code for url, _, status_code, _ in checkpoint.iter_results()},
+            {url: 200 for url in self.all_urls},
+        )
+        assert_equal(checkpoint.load_frontier(), [])
+
+    def test_resumed_crawler_should_continue_after_failure(self):
+        first_urls, second_urls = [], []
+
+        def post_response(url, referer, resp, exception):
+            first_urls.append(url)
+            if url == "/pages/3/":
+                raise RuntimeError("post_response failed")
+
+        crawler = self.create_crawler([], checkpoint_interval=1)
+        crawler.post_response = post_response
+        with assert_raises(RuntimeError):
+            crawler.run()
+
+        self.create_crawler(second_urls).resume()
+        assert_false(set(first_urls) & set(second_urls))
+        assert_equal(set(first_urls) | set(second_urls), self.all_urls)
+
+    def test_resumed_crawler_should_not_crawl_finished_crawl_again(self):
+        first_urls, second_urls = [], []
+        self.create_crawler(first_urls).run()
+        crawler = self.create_crawler(second_urls)
+        crawler.resume()
+        assert_equal(second_urls, [])
+        assert_equal(crawler.crawled_urls, self.all_urls)
+
+    def test_resume_without_checkpoint_path_should_raise_error(self):
+        with assert_raises(ValueError):
+            Crawler(Client(), ("/pages/1/",)).resume()
+
+
+class CrawlReportTestCase(TestCase):
+
+    # Queries are captured in all databases
+    databases = {"default", "other"}
+
+    def setUp(self):
+        Author.objects.create(name="Reported author")
+        self.report = CrawlReport()
+        Crawler(Client(), ("/pages/1/",), report=self.report).run()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+    def test_report_should_record_every_crawled_url(self):
+        records = {record["url"]: record for record in self.report.records}
+        assert_equal(set(records), {"/pages/{}/".format(i) for i in range(1, 20)})
+        assert_equal(records["/pages/1/"]["referer"], None)
+        assert_equal(records["/pages/5/"]["referer"], "/pages/2/")
+        for url, record in records.items():
+            assert_equal(record["status_code"], 200)
+            assert_equal(record["redirects"], 0)
+            assert_equal(record["size"], len(Client().get(url).content))
+            assert_equal(record["queries"], 1)
+            assert_true(record["duration"] >= record["query_time"] >= 0)
+
+    def test_report_should_record_failed_request(self):
+        def send_request():
+            list(Author.objects.all())
+            raise RuntimeError("request failed")
+
+        report = CrawlReport()
+        with assert_raises(RuntimeError):
+            report.request("/failed/", "/", send_request)
+        assert_equal(len(report.records), 1)
+        record = report.records[0]
+        assert_equal(
+            (record["url"], record["status_code"], record["size"], record["queries"]),
+            ("/failed/", None, None, 1),
+        )
+
+    def test_report_should_be_written_to_csv_file(self):
+        path = os.path.join(self.tmp_dir, "crawl.csv")
+        self.report.write(path)
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        assert_equal(tuple(reader.fieldnames), CrawlReport.fields)
+        assert_equal(
+            [(row["url"], row["referer"], int(row["size"])) for row in rows],
+            [
+                (record["url"], record["referer"] or "", record["size"])
+                for record in self.report.records
+            ],
+        )
+
+    def test_report_should_be_written_to_json_file(self):
+        path = os.path.join(self.tmp_dir, "crawl.json")
+        self.report.write(path)
+        with open(path) as f:
+            assert_equal(json.load(f), self.report.records)
+
+    def test_report_summary_should_print_top_records(self):
+        self.report.add_record(
+            dict(
+                self.report.records[0],
+                url="/failed/",
+                status_code=None,
+                size=None,
+                duration=100,
+                queries=5,
+            )
+        )
+        stream = StringIO()
+        self.report.print_summary(2, stream=stream)
+        summary = stream.getvalue()
+        assert_in("2 slowest pages:\n100.000s /failed/ (None B", summary)
+        assert_in("2 largest pages:", summary)
+        assert_in("2 pages with the most queries:", summary)
+        # Records without the size are not in the largest pages
+        assert_equal(summary.count("/failed/"), 2)
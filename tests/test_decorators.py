@@ -0,0 +1,51 @@
+from germanium.decorators import data_consumer, refresh_model_objects
+from germanium.test_cases.default import GermaniumTestCase
+from germanium.tools import assert_equal, assert_false, assert_true
+
+from .models import Author, RefreshedAuthor
+
+
+class RefreshModelObjectsTestCase(GermaniumTestCase):
+
+    def test_refresh_model_objects_should_normalize_primary_keys(self):
+        author = Author.objects.create(name="Author")
+        obj = Author(pk=str(author.pk), name="Changed")
+        refresh_model_objects(obj)
+        assert_equal(obj.name, "Author")
+
+    def test_refresh_model_objects_should_use_overridden_refresh_from_db(self):
+        author = RefreshedAuthor.objects.create(name="Author")
+        other_author = Author.objects.create(name="Other author")
+        author.name = other_author.name = "Changed"
+        refresh_model_objects(author, other_author)
+        assert_equal(author.name, "Author")
+        assert_true(author.refreshed)
+        assert_equal(other_author.name, "Other author")
+
+    def test_data_consumer_should_refresh_objects_with_overridden_refresh_from_db(
+        self,
+    ):
+        for lazy_rollback in (False, True):
+            with self.subTest(lazy_rollback=lazy_rollback):
+                authors = [RefreshedAuthor.objects.create(name="Author")]
+
+                @data_consumer(authors, _lazy_rollback=lazy_rollback)
+                def change_author(self, author):
+                    author.name = "Changed"
+                    author.save()
+
+                change_author(self)
+                assert_equal(authors[0].name, "Author")
+                assert_true(authors[0].refreshed)
+
+    def test_data_consumer_with_lazy_rollback_should_not_refresh_read_only_tests(
+        self,
+    ):
+        authors = [RefreshedAuthor.objects.create(name="Author")]
+
+        @data_consumer(authors, _lazy_rollback=True)
+        def read_author(self, author):
+            assert_true(Author.objects.filter(pk=author.pk).exists())
+
+        read_author(self)
+        assert_false(hasattr(authors[0], "refreshed"))
@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+
+from io import StringIO
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from germanium.django.fixtures import (
+    BulkFixtureLoader,
+    find_fixture_files,
+    fixture_snapshots,
+    get_fixture_digest,
+    iter_json_array,
+    load_fixtures,
+)
+from germanium.tools import assert_equal, assert_in, assert_raises
+
+from .models import Author, Book, Tag
+from .utils import run_test_command
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_FILES_DIR = os.path.join(TESTS_DIR, "fixture_files")
+
+
+class IterJSONArrayTestCase(SimpleTestCase):
+
+    def test_items_spanning_chunk_boundaries_should_be_parsed(self):
+        items = [
+            {
+                "model": "tests.author",
+                "pk": i,
+                "fields": {"name": "Author {}".format(i)},
+            }
+            for i in range(20)
+        ]
+        content = json.dumps(items, indent=2)
+        for chunk_size in (1, 7, 64, len(content)):
+            with self.subTest(chunk_size=chunk_size):
+                assert_equal(
+                    list(iter_json_array(StringIO(content), chunk_size=chunk_size)),
+                    items,
+                )
+
+    def test_empty_array_should_be_parsed(self):
+        assert_equal(list(iter_json_array(StringIO(" [ ] "), chunk_size=2)), [])
+
+    def test_malformed_json_should_raise_error(self):
+        for content in (
+            '[{"a": 1}',
+            '[{"a": 1},]',
+            '[{"a": 1} {"a": 2}]',
+            '{"a": 1}',
+            "",
+        ):
+            with self.subTest(content=content):
+                with assert_raises(ValueError):
+                    list(iter_json_array(StringIO(content), chunk_size=4))
+
+
+class LoadFixturesTestCase(TestCase):
+
+    def write_fixture(self, tmp_dir, name, objects):
+        path = os.path.join(tmp_dir, name)
+        with open(path, "w") as f:
+            json.dump(objects, f)
+        return path
+
+    def test_fixture_files_referencing_fixture_labels_should_be_loaded_in_declared_order(
+        self,
+    ):
+        for snapshot in (False, True):
+            with self.subTest(snapshot=snapshot):
+                Book.objects.all().delete()
+                Author.objects.all().delete()
+                load_fixtures(
+                    "default",
+                    [
+                        os.path.join(FIXTURE_FILES_DIR, "authors.jsonl"),
+                        "authors",
+                        os.path.join(FIXTURE_FILES_DIR, "books.json"),
+                    ],
+                    snapshot=snapshot,
+                )
+                assert_equal(Author.objects.count(), 3)
+                assert_equal(
+                    dict(Book.objects.values_list("title", "author__name")),
+                    {"First book": "First author", "Second book": "Second author"},
+                )
+
+    def test_fixture_label_should_be_resolved_to_fixture_files(self):
+        authors_fixture = os.path.join(TESTS_DIR, "fixtures", "authors.json")
+        assert_equal(find_fixture_files("authors"), [authors_fixture])
+        assert_equal(find_fixture_files("authors.json"), [authors_fixture])
+
+        load_fixtures("default", ["authors"], snapshot=True)
+        assert_in(get_fixture_digest(authors_fixture), fixture_snapshots)
+        assert_equal(Author.objects.count(), 2)
+
+    def test_test_case_fixtures_should_be_loaded_from_snapshot(self):
+        result = run_test_command(
+            "tests.suites.snapshot_fixtures", env={"GERMANIUM_SNAPSHOT_FIXTURES": "1"}
+        )
+        assert_equal(result.returncode, 0, result.stderr)
+        assert_in("Ran 2 tests", result.stderr)
+
+    def test_m2m_relations_should_be_loaded_with_through_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            load_fixtures(
+                "default",
+                [
+                    "authors",
+                    self.write_fixture(
+                        tmp_dir,
+                        "books.json",
+                        [
+                            {
+                                "model": "tests.tag",
+                                "pk": 1,
+                                "fields": {"name": "Novel"},
+                            },
+                            {"model": "tests.tag", "pk": 2, "fields": {"name": "Poem"}},
+                            {
+                                "model": "tests.book",
+                                "pk": 1,
+                                "fields": {
+                                    "title": "Book",
+                                    "author": 1,
+                                    "tags": [1, 2],
+                                },
+                            },
+                            {
+                                "model": "tests.book",
+                                "pk": 2,
+                                "fields": {"title": "Other", "author": 2, "tags": [2]},
+                            },
+                        ],
+                    ),
+                ],
+                batch_size=1,
+            )
+        assert_equal(
+            set(Book.tags.through.objects.values_list("book_id", "tag_id")),
+            {(1, 1), (1, 2), (2, 2)},
+        )
+
+    def test_existing_rows_should_be_updated_with_save(self):
+        Author.objects.create(pk=1, name="Old author")
+        with patch.object(
+            BulkFixtureLoader,
+            "_save_objects",
+            autospec=True,
+            side_effect=BulkFixtureLoader._save_objects,
+        ) as save_objects:
+            load_fixtures("default", ["authors"])
+        # Batch is saved object by object after IntegrityError of bulk_create
+        assert_equal(save_objects.call_count, 1)
+        assert_equal(
+            dict(Author.objects.values_list("pk", "name")),
+            {1: "First author", 2: "Second author"},
+        )
+
+    def test_sequences_of_loaded_models_should_be_reset(self):
+        loader = BulkFixtureLoader("default")
+        with connection.constraint_checks_disabled():
+            loader.load(
+                [
+                    {"model": "tests.author", "pk": 10, "fields": {"name": "Author"}},
+                    {"model": "tests.tag", "pk": 5, "fields": {"name": "Tag"}},
+                ]
+            )
+            loader.flush()
+        with patch.object(
+            connection.ops,
+            "sequence_reset_sql",
+            wraps=connection.ops.sequence_reset_sql,
+        ) as sequence_reset_sql:
+            loader.finish()
+        assert_equal(set(sequence_reset_sql.call_args.args[1]), {Author, Tag})
+        assert_equal(Author.objects.create(name="New author").pk, 11)
@@ -0,0 +1,36 @@
+from germanium.test_cases.models import ModelTestCase
+from germanium.tools import assert_equal, assert_num_queries, assert_raises
+
+from .factories import BookFactory
+from .models import Author, Book, Tag
+
+
+class BulkInstsDataProviderTestCase(ModelTestCase):
+
+    factory_class = BookFactory
+
+    def test_bulk_insts_data_provider_should_insert_sub_factories_and_m2m(self):
+        tags = [Tag.objects.create(name="Novel"), Tag.objects.create(name="Poem")]
+        # Authors, books and M2M through rows are inserted with one query per model
+        with assert_num_queries(3):
+            books = self.bulk_insts_data_provider(count=5, tags=tags)
+
+        assert_equal(len(books), 5)
+        assert_equal(Book.objects.count(), 5)
+        assert_equal(Author.objects.count(), 5)
+        for book in books:
+            assert_equal(
+                Book.objects.values_list("author__name", flat=True).get(pk=book.pk),
+                book.author.name,
+            )
+            assert_equal(set(book.tags.all()), set(tags))
+
+    def test_bulk_insts_data_provider_should_load_instances_by_pks(self):
+        books = self.bulk_insts_data_provider(count=3)
+        pks = [str(book.pk) for book in reversed(books)]
+        with assert_num_queries(1):
+            assert_equal(self.bulk_insts_data_provider(pks=pks), list(reversed(books)))
+        with assert_raises(Book.DoesNotExist):
+            self.bulk_insts_data_provider(
+                pks=pks + [max(book.pk for book in books) + 1]
+            )
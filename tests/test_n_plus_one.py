@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from germanium.tools import assert_equal, assert_in, assert_not_in, assert_true
+
+from .utils import run_test_command
+
+
+class NPlusOneDetectorTestCase(SimpleTestCase):
+
+    def run_n_plus_one_tests(self, *args):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "n_plus_one.json")
+            result = run_test_command(
+                "tests.suites.n_plus_one",
+                "--germanium-n-plus-one={}".format(path),
+                "--germanium-n-plus-one-threshold=2",
+                *args
+            )
+            with open(path) as f:
+                return result, json.load(f)
+
+    def test_only_repeated_select_queries_should_be_offenders(self):
+        result, offenders = self.run_n_plus_one_tests()
+        assert_equal(result.returncode, 0, result.stderr)
+        assert_equal(len(offenders), 1)
+        assert_true(offenders[0]["fingerprint"].startswith("SELECT"))
+        assert_equal(offenders[0]["max_count"], 10)
+        assert_in("N+1 queries (1 new offenders)", result.stderr)
+        assert_not_in("--germanium-n-plus-one-fail", result.stderr)
+
+    def test_offenders_should_fail_run_only_with_fail_option(self):
+        result, _ = self.run_n_plus_one_tests("--germanium-n-plus-one-fail")
+        assert_equal(result.returncode, 1)
+        assert_in(
+            "The test run fails because of 1 new N+1 query offenders", result.stderr
+        )
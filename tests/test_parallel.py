@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from germanium.django.parallel import (
+    SUBSUITE_FINISHED_EVENT,
+    GermaniumParallelResult,
+    GermaniumParallelTestSuite,
+    TestDurations,
+)
+from germanium.tools import assert_equal, assert_in, assert_true
+
+from .suites.profiled import NotProfiledTestCase, ProfiledTestCase
+from .utils import run_test_command
+
+
+class TestResult:
+
+    def __init__(self):
+        self.successes = []
+
+    def addSuccess(self, test):
+        self.successes.append(test)
+
+
+class GermaniumParallelTestSuiteTestCase(SimpleTestCase):
+
+    def test_worker_data_should_be_handled_with_django_4_event_dispatching(self):
+        # Django < 5.0 calls result methods directly without ParallelTestSuite.handle_event
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            suite = GermaniumParallelTestSuite([], processes=2)
+            suite.test_durations = TestDurations(os.path.join(tmp_dir, "durations"))
+            result = TestResult()
+            parallel_result = GermaniumParallelResult(result, suite)
+            tests = [ProfiledTestCase("test_profiled")]
+            for event in (
+                ("addSuccess", 0),
+                (SUBSUITE_FINISHED_EVENT, -1, {"duration": 1.5}),
+            ):
+                handler = getattr(parallel_result, event[0], None)
+                handler(tests[event[1]], *event[2:])
+
+            assert_equal(result.successes, tests)
+            assert_equal(
+                suite.test_durations.durations,
+                {"tests.suites.profiled.ProfiledTestCase": 1.5},
+            )
+
+    def test_parallel_run_should_record_test_case_durations(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "durations.json")
+            result = run_test_command(
+                "tests.suites.profiled",
+                "--parallel=2",
+                env={"GERMANIUM_TEST_DURATIONS_FILE": path},
+            )
+            assert_equal(result.returncode, 0, result.stderr)
+            with open(path) as f:
+                durations = json.load(f)
+            assert_equal(len(durations), 3)
+            for test_case in (ProfiledTestCase, NotProfiledTestCase):
+                assert_in(
+                    "tests.suites.profiled.{}".format(test_case.__name__), durations
+                )
+            assert_true(all(duration > 0 for duration in durations.values()))
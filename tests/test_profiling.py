@@ -0,0 +1,43 @@
+import os
+import pstats
+import tempfile
+
+from django.test import SimpleTestCase
+
+from germanium.profiling import TestProfiler
+from germanium.tools import assert_equal, assert_in, assert_is_none, assert_true
+
+from .utils import run_test_command
+
+
+class TestProfilerTestCase(SimpleTestCase):
+
+    def test_pop_data_without_profiled_test_should_return_none(self):
+        for format in TestProfiler.formats:
+            profiler = TestProfiler()
+            profiler.format = format
+            assert_is_none(profiler.pop_data())
+            profiler.add_data(None)
+            profiler.add_data({})
+
+    def test_parallel_run_with_not_profiled_subsuites_should_merge_stats(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for format in TestProfiler.formats:
+                path = os.path.join(tmp_dir, "tests.{}".format(format))
+                result = run_test_command(
+                    "tests.suites.profiled",
+                    "--parallel=2",
+                    "--germanium-profile={}".format(path),
+                    "--germanium-profile-format={}".format(format),
+                )
+                assert_equal(result.returncode, 0, result.stderr)
+                if format == "pstats":
+                    functions = {
+                        function_name
+                        for _, _, function_name in pstats.Stats(path).stats
+                    }
+                    assert_in("test_profiled", functions)
+                    assert_true("test_not_profiled" not in functions)
+                else:
+                    with open(path) as f:
+                        assert_in("test_profiled", f.read())
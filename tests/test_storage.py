@@ -0,0 +1,201 @@
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from germanium.storage import (
+    FlatInMemoryDir,
+    InMemoryDir,
+    PathDoesNotExist,
+    TestInMemoryStorage,
+    clean_test_filesystem,
+    test_filesystem_snapshots,
+    test_storages,
+)
+from germanium.tools import assert_equal, assert_false, assert_raises, assert_true
+
+
+def read(filesystem, path):
+    with filesystem.open(path, "rb") as f:
+        return f.read()
+
+
+class InMemoryOverlayDirTestCase(SimpleTestCase):
+
+    def create_snapshot(self):
+        snapshot = InMemoryDir()
+        snapshot.save("a.txt", b"a")
+        snapshot.save("dir/b.txt", b"b")
+        snapshot.save("dir/sub/c.txt", b"c")
+        return snapshot
+
+    def test_overlay_changes_should_not_change_snapshot(self):
+        snapshot = self.create_snapshot()
+        overlay = snapshot.fork()
+        overlay.save("a.txt", b"changed")
+        overlay.save("dir/new.txt", b"new")
+        overlay.delete("dir/b.txt")
+        overlay.delete("dir/sub")
+
+        assert_equal(read(overlay, "a.txt"), b"changed")
+        assert_equal(overlay.listdir("dir"), [[], ["new.txt"]])
+        assert_false(overlay.exists("dir/b.txt"))
+        assert_false(overlay.exists("dir/sub/c.txt"))
+
+        assert_equal(read(snapshot, "a.txt"), b"a")
+        assert_equal(sorted(snapshot.ls("dir")), ["b.txt", "sub"])
+        assert_equal(read(snapshot, "dir/sub/c.txt"), b"c")
+
+    def test_new_overlay_should_reset_changes(self):
+        snapshot = self.create_snapshot()
+        overlay = snapshot.fork()
+        overlay.delete("a.txt")
+        overlay.save("a.txt", b"recreated")
+        assert_equal(read(overlay, "a.txt"), b"recreated")
+
+        overlay = snapshot.fork()
+        assert_equal(read(overlay, "a.txt"), b"a")
+        assert_equal(sorted(overlay.ls()), ["a.txt", "dir"])
+        with assert_raises(PathDoesNotExist):
+            overlay.resolve("dir/new.txt")
+
+    def test_storage_fixtures_should_be_loaded_from_snapshot_for_every_test(self):
+        class FixturesStorage(TestInMemoryStorage):
+            filesystem_name = "overlay_fixtures"
+
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            os.makedirs(os.path.join(fixture_dir, "overlay_fixtures", "dir"))
+            with open(
+                os.path.join(fixture_dir, "overlay_fixtures", "dir", "a.txt"), "wb"
+            ) as f:
+                f.write(b"fixture")
+
+            with override_settings(FIXTURE_DIRS=[fixture_dir]):
+                storage = FixturesStorage()
+                try:
+                    storage.load_fixtures()
+                    assert_equal(storage.open("dir/a.txt", "rb").read(), b"fixture")
+                    storage.delete("dir/a.txt")
+                    storage.save("dir/b.txt", ContentFile(b"b"))
+                    assert_equal(storage.listdir("dir"), [[], ["b.txt"]])
+
+                    storage.load_fixtures()
+                    assert_equal(storage.listdir("dir"), [[], ["a.txt"]])
+                    assert_equal(storage.open("dir/a.txt", "rb").read(), b"fixture")
+                finally:
+                    test_storages.remove(storage)
+                    test_filesystem_snapshots.pop("overlay_fixtures", None)
+
+
+class FlatInMemoryDirTestCase(SimpleTestCase):
+
+    def test_listdir_should_return_directories_and_files(self):
+        filesystem = FlatInMemoryDir()
+        for i in range(100):
+            filesystem.save("dir/file{}.txt".format(i), b"data")
+        filesystem.save("dir/sub/a.txt", b"a")
+        filesystem.save("dir/sub/deep/b.txt", b"b")
+
+        dirs, files = filesystem.listdir("dir")
+        assert_equal(dirs, ["sub"])
+        assert_equal(len(files), 100)
+        assert_equal(filesystem.listdir("/dir/sub/"), [["deep"], ["a.txt"]])
+        assert_equal(filesystem.listdir(""), [["dir"], []])
+        assert_equal(read(filesystem, "dir/./sub/deep/b.txt"), b"b")
+        with assert_raises(PathDoesNotExist):
+            filesystem.listdir("dir/file1.txt")
+        with assert_raises(PathDoesNotExist):
+            filesystem.listdir("missing")
+        with assert_raises(PathDoesNotExist):
+            filesystem.save("dir/file1.txt/c.txt", b"c")
+
+    def test_deleted_base_paths_should_be_hidden_with_tombstones(self):
+        base = FlatInMemoryDir()
+        base.save("dir/a.txt", b"a")
+        base.save("dir/b.txt", b"b")
+        base.save("dir/sub/c.txt", b"c")
+
+        filesystem = base.fork()
+        filesystem.delete("dir/a.txt")
+        filesystem.delete("dir/sub")
+        filesystem.save("dir/b.txt", b"changed")
+
+        assert_equal(filesystem.listdir("dir"), [[], ["b.txt"]])
+        assert_false(filesystem.exists("dir/a.txt"))
+        assert_false(filesystem.exists("dir/sub"))
+        assert_false(filesystem.exists("dir/sub/c.txt"))
+        with assert_raises(PathDoesNotExist):
+            filesystem.delete("dir/a.txt")
+
+        # Deleted path can be created again
+        filesystem.save("dir/sub/c.txt", b"new")
+        assert_equal(filesystem.listdir("dir/sub"), [[], ["c.txt"]])
+        assert_equal(read(filesystem, "dir/sub/c.txt"), b"new")
+
+        # Base is not changed
+        assert_equal(base.listdir("dir"), [["sub"], ["a.txt", "b.txt"]])
+        assert_equal(read(base, "dir/b.txt"), b"b")
+        assert_equal(read(base, "dir/sub/c.txt"), b"c")
+        assert_equal(read(base.fork(), "dir/a.txt"), b"a")
+
+    def test_root_directory_should_not_be_deleted(self):
+        with assert_raises(ValueError):
+            FlatInMemoryDir().delete("/")
+
+
+class InMemoryFileTestCase(SimpleTestCase):
+
+    def test_file_should_switch_between_text_and_bytes_modes(self):
+        for filesystem_class in (InMemoryDir, FlatInMemoryDir):
+            with self.subTest(filesystem_class=filesystem_class.__name__):
+                filesystem = filesystem_class()
+                with filesystem.open("dir/a.txt", "w") as f:
+                    f.write("čaj\n")
+                    # Size of the UTF-8 encoded content is returned before the text is flushed
+                    assert_equal(f.size, 5)
+                assert_equal(filesystem.size("dir/a.txt"), 5)
+
+                with filesystem.open("dir/a.txt", "rb") as f:
+                    assert_equal(f.read(), "čaj\n".encode("utf-8"))
+                with filesystem.open("dir/a.txt", "r") as f:
+                    assert_equal(f.read(), "čaj\n")
+                with filesystem.open("dir/a.txt", "rb") as f:
+                    assert_equal(f.read(), "čaj\n".encode("utf-8"))
+
+                with filesystem.open("dir/b.bin", "wb") as f:
+                    f.write(b"\xc5\xa1\r\n")
+                    assert_equal(f.size, 4)
+                with filesystem.open("dir/b.bin", "r") as f:
+                    # Newlines are not translated
+                    assert_equal(f.read(), "š\r\n")
+                assert_equal(filesystem.size("dir/b.bin"), 4)
+
+                with filesystem.open("dir/a.txt", "w") as f:
+                    f.write("x")
+                assert_equal(filesystem.size("dir/a.txt"), 1)
+                assert_equal(read(filesystem, "dir/a.txt"), b"x")
+
+    def test_copied_file_should_not_share_content(self):
+        filesystem = InMemoryDir()
+        filesystem.save("a.txt", "text")
+        file = filesystem.resolve("a.txt")
+        copy = file.copy()
+        with filesystem.open("a.txt", "w") as f:
+            f.write("changed")
+        copy.open("r")
+        assert_equal(copy.read(), "text")
+        assert_equal(copy.size, 4)
+
+    def test_storage_should_save_text_and_bytes_content(self):
+        storage = TestInMemoryStorage()
+        test_storages.remove(storage)
+        try:
+            storage.save("text.txt", ContentFile("čaj"))
+            storage.save("bytes.bin", ContentFile(b"\x00\x01"))
+            assert_equal(storage.size("text.txt"), 4)
+            assert_equal(storage.open("text.txt", "r").read(), "čaj")
+            assert_equal(storage.open("bytes.bin", "rb").read(), b"\x00\x01")
+            assert_equal(storage.size("bytes.bin"), 2)
+        finally:
+            clean_test_filesystem(sender=None)
@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from germanium.django.utils import get_test_db_hash
+from germanium.tools import assert_equal, assert_not_equal
+
+
+class TestDBHashTestCase(SimpleTestCase):
+
+    def test_test_db_hash_should_be_changed_with_contents_of_fixture_label_file(self):
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            with override_settings(FIXTURE_DIRS=[fixture_dir]):
+                fixture_path = os.path.join(fixture_dir, "global_authors.json")
+                with open(fixture_path, "w") as f:
+                    f.write("[]")
+                test_db_hash = get_test_db_hash(["global_authors"])
+                assert_equal(get_test_db_hash(["global_authors"]), test_db_hash)
+
+                with open(fixture_path, "w") as f:
+                    f.write(
+                        '[{"model": "tests.author", "pk": 1, "fields": {"name": "Author"}}]'
+                    )
+                assert_not_equal(get_test_db_hash(["global_authors"]), test_db_hash)
+                # Fixture defined with the file path has the same hash
+                assert_equal(
+                    get_test_db_hash([fixture_path]),
+                    get_test_db_hash(["global_authors"]),
+                )
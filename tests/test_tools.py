@@ -0,0 +1,195 @@
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import TestCase
+
+from germanium.tools import (
+    assert_equal,
+    assert_equal_model_fields,
+    assert_in,
+    assert_num_queries,
+    assert_qs_contains,
+    assert_qs_not_contains,
+    assert_query_budget,
+    assert_raises,
+    capture_commit_callbacks,
+)
+from germanium.tools.django import ALL_DATABASES
+
+from .models import Author, Book
+
+
+class AssertQueryBudgetTestCase(TestCase):
+
+    def test_query_budget_error_should_contain_identical_queries(self):
+        author = Author.objects.create(name="Author")
+        other_author = Author.objects.create(name="Other author")
+        with assert_raises(AssertionError) as context:
+            with assert_query_budget(max_repeats=2):
+                for pk in (author.pk, author.pk, author.pk, other_author.pk):
+                    Author.objects.get(pk=pk)
+        message = str(context.exception)
+        assert_in("query executed 4 times (3 identical), 2 allowed", message)
+        assert_in("identical queries:\n    3x SELECT", message)
+        assert_in("({},)".format(author.pk), message)
+
+    def test_query_budget_stats_should_contain_duplicates(self):
+        author = Author.objects.create(name="Author")
+        with assert_query_budget(max_num=3) as context:
+            Author.objects.get(pk=author.pk)
+            Author.objects.get(pk=author.pk)
+            Author.objects.count()
+        assert_equal(len(context.stats.get_duplicates()), 1)
+        assert_equal(context.stats.get_duplicates()[0][2], 2)
+
+
+class AssertQsContainsTestCase(TestCase):
+
+    def setUp(self):
+        Author.objects.bulk_create(
+            [Author(name="Author {}".format(i)) for i in range(10)]
+        )
+        self.authors = list(Author.objects.order_by("pk"))
+        self.even_authors = Author.objects.filter(
+            pk__in=[author.pk for author in self.authors[::2]]
+        )
+        # IN lists are split to batches of 2 pks
+        patcher = patch.object(connection.features, "max_query_params", 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_assert_qs_contains_should_split_pks_to_batches(self):
+        with assert_num_queries(5):
+            assert_qs_contains(Author.objects.all(), self.authors)
+        with assert_num_queries(3):
+            assert_qs_contains(self.even_authors, self.authors[::2])
+        assert_qs_contains(Author.objects.all(), self.authors[0])
+
+    def test_assert_qs_contains_should_report_missing_pks_from_all_batches(self):
+        with assert_raises(AssertionError) as context:
+            assert_qs_contains(self.even_authors, self.authors)
+        assert_equal(
+            str(context.exception),
+            "5 of 10 objects are missing in the queryset, pks: {}".format(
+                ", ".join(str(author.pk) for author in self.authors[1::2])
+            ),
+        )
+
+    def test_assert_qs_not_contains_should_split_pks_to_batches(self):
+        with assert_num_queries(3):
+            assert_qs_not_contains(self.even_authors, self.authors[1::2])
+        with assert_raises(AssertionError):
+            assert_qs_not_contains(
+                self.even_authors, self.authors[1::2] + [self.authors[8]]
+            )
+
+    def test_assert_qs_contains_should_compare_querysets_in_one_query(self):
+        with assert_num_queries(1):
+            assert_qs_contains(Author.objects.all(), self.even_authors)
+        with assert_raises(AssertionError):
+            assert_qs_contains(self.even_authors, Author.objects.all())
+
+
+class AssertEqualModelFieldsTestCase(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            Book.objects.create(
+                title="Book {}".format(i),
+                author=Author.objects.create(name="Author"),
+            )
+
+    def test_assert_equal_model_fields_of_queryset_should_select_relations(self):
+        with assert_num_queries(1):
+            assert_equal_model_fields(Book.objects.all(), author__name="Author")
+
+    def test_assert_equal_model_fields_of_instances_should_prefetch_relations(self):
+        books = list(Book.objects.all())
+        with assert_num_queries(1):
+            assert_equal_model_fields(books, author__name="Author")
+        # Prefetched relations are cached
+        with assert_num_queries(0):
+            assert_equal_model_fields(books, author__name="Author")
+
+    def test_assert_equal_model_fields_with_refresh_should_select_relations(self):
+        books = list(Book.objects.all())
+        Author.objects.update(name="Renamed author")
+        with assert_num_queries(1):
+            assert_equal_model_fields(
+                books, refresh_from_db=True, author__name="Renamed author"
+            )
+
+    def test_assert_equal_model_fields_should_report_invalid_instance(self):
+        book = Book.objects.last()
+        Author.objects.filter(pk=book.author_id).update(name="Other author")
+        with assert_raises(AssertionError) as context:
+            assert_equal_model_fields(Book.objects.all(), author__name="Author")
+        assert_in(
+            'Invalid value of "author__name" of Book with pk {}'.format(book.pk),
+            str(context.exception),
+        )
+        with assert_raises(AssertionError) as context:
+            assert_equal_model_fields(book, refresh_from_db=True, title="Other")
+        assert_in('Invalid value of "title"', str(context.exception))
+
+
+class CaptureCommitCallbacksTestCase(TestCase):
+
+    databases = {"default", "other"}
+
+    def setUp(self):
+        self.calls = []
+
+    def on_commit(self, name, using, *next_callbacks):
+        """
+        Register the callback which registers next callbacks (tuples name, using, *next_callbacks) when called.
+        """
+
+        def callback():
+            self.calls.append(name)
+            for next_callback in next_callbacks:
+                self.on_commit(*next_callback)
+
+        transaction.on_commit(callback, using=using)
+
+    def test_cascade_should_execute_callbacks_of_all_databases_level_by_level(self):
+        with capture_commit_callbacks(
+            using=ALL_DATABASES, execute_on_commit_cascade=True
+        ) as callbacks:
+            self.on_commit("other a", "other", ("default b", "default"))
+            self.on_commit(
+                "default a",
+                "default",
+                ("other b", "other", ("other d", "other")),
+                ("default c", "default"),
+            )
+            self.on_commit("other c", "other")
+        # Callbacks of one level are executed in the order of the databases
+        assert_equal(
+            self.calls,
+            [
+                "default a",
+                "other a",
+                "other c",
+                "default c",
+                "default b",
+                "other b",
+                "other d",
+            ],
+        )
+        assert_equal(callbacks.on_commit.get_callbacks(), [])
+
+    def test_on_commit_should_execute_only_first_level_of_all_databases(self):
+        with capture_commit_callbacks(using=ALL_DATABASES, execute_on_commit=True):
+            self.on_commit("other a", "other", ("default b", "default"))
+            self.on_commit("default a", "default")
+        assert_equal(self.calls, ["default a", "other a"])
+
+    def test_capture_commit_callbacks_should_capture_only_selected_databases(self):
+        with capture_commit_callbacks(
+            using=["other"], execute_on_commit_cascade=True
+        ) as callbacks:
+            self.on_commit("default a", "default")
+            self.on_commit("other a", "other", ("other b", "other"))
+        assert_equal(self.calls, ["other a", "other b"])
+        assert_equal(len(callbacks.on_commit.get_callbacks()), 0)
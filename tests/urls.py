@@ -0,0 +1,22 @@
+from django.http import HttpResponse
+from django.urls import path
+
+from .models import Author
+
+
+def page(request, number):
+    children = "".join(
+        '<a href="/pages/{}/">{}</a>'.format(child, child)
+        for child in (2 * number, 2 * number + 1)
+        if child < 20
+    )
+    return HttpResponse(
+        "<html><body>{}{}</body></html>".format(
+            ", ".join(Author.objects.values_list("name", flat=True)), children
+        )
+    )
+
+
+urlpatterns = [
+    path("pages/<int:number>/", page),
+]
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_test_command(*args, env=None):
+    """
+    Run the test command with the tests settings in the new process.
+    """
+    return subprocess.run(
+        [sys.executable, "-m", "django", "test", "--noinput", *args],
+        cwd=ROOT_DIR,
+        env=dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE="tests.settings",
+            GERMANIUM_TEST_DB_NAME="test_db_command.sqlite3",
+            **(env or {})
+        ),
+        capture_output=True,
+        text=True,
+    )